@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import inspect, text
 from typing import Generator
 import os
 
@@ -7,10 +8,32 @@ DATABASE_URL = "sqlite:///./job_tracker.db"
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 
+# Columns added after the first release, as (table, column, SQL definition)
+ADDED_COLUMNS = [
+    ("user", "stale_after_days", "INTEGER DEFAULT 30"),
+    ("user", "auto_withdraw_stale", "BOOLEAN NOT NULL DEFAULT 0"),
+    ("jobapplication", "is_stale", "BOOLEAN NOT NULL DEFAULT 0"),
+]
+
+
+def add_missing_columns():
+    """Add newer columns to tables created by an older version"""
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table, column, definition in ADDED_COLUMNS:
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column not in existing:
+                connection.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {definition}'))
+
 
 def create_db_and_tables():
     """Create database and tables"""
     SQLModel.metadata.create_all(engine)
+    add_missing_columns()
+    # create_all skips indexes of tables that already exist
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 
 def get_session() -> Generator[Session, None, None]:
@@ -4,6 +4,8 @@ from sqlmodel import Session
 from .database import engine, create_db_and_tables, get_session
 from .routers import applications, users
 from .auth import create_default_user
+from .stats import ensure_status_counts, ensure_status_events
+from .sweeper import start_sweeper, stop_sweeper, sweeper_metrics
 
 app = FastAPI(
     title="Job Application Tracker",
@@ -42,7 +44,17 @@ def on_startup():
     # Create default user
     session = Session(engine)
     create_default_user(session)
+    ensure_status_counts(session)
+    ensure_status_events(session)
     session.close()
+    # Flag stale applications in the background
+    start_sweeper()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """Stop background jobs"""
+    stop_sweeper()
 
 
 # Include routers
@@ -68,4 +80,8 @@ def root():
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "job-tracker-api"}
+    return {
+        "status": "healthy",
+        "service": "job-tracker-api",
+        "stale_sweeper": sweeper_metrics
+    }
@@ -1,7 +1,8 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, UniqueConstraint
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
 from enum import Enum
 
 
@@ -14,6 +15,19 @@ class ApplicationStatus(str, Enum):
     WITHDRAWN = "withdrawn"
 
 
+class ApplicationSort(str, Enum):
+    """Sortable job application fields"""
+    APPLICATION_DATE = "application_date"
+    COMPANY = "company"
+    STATUS = "status"
+
+
+class SortOrder(str, Enum):
+    """Sort direction enum"""
+    ASC = "asc"
+    DESC = "desc"
+
+
 class User(SQLModel, table=True):
     """User model for database"""
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -22,6 +36,8 @@ class User(SQLModel, table=True):
     hashed_password: str
     is_active: bool = Field(default=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    stale_after_days: Optional[int] = Field(default=30)
+    auto_withdraw_stale: bool = Field(default=False)
 
     # Relationship
     applications: List["JobApplication"] = Relationship(back_populates="user")
@@ -29,6 +45,10 @@ class User(SQLModel, table=True):
 
 class JobApplication(SQLModel, table=True):
     """Job application model for database"""
+    __table_args__ = (
+        Index("ix_jobapplication_user_status_date", "user_id", "status", "application_date"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     company: str = Field(index=True)
     position: str = Field(index=True)
@@ -36,12 +56,36 @@ class JobApplication(SQLModel, table=True):
     application_date: datetime = Field(default_factory=datetime.utcnow)
     description: Optional[str] = None
     notes: Optional[str] = None
+    is_stale: bool = Field(default=False)
     user_id: int = Field(foreign_key="user.id")
 
     # Relationship
     user: User = Relationship(back_populates="applications")
 
 
+class ApplicationStatusCount(SQLModel, table=True):
+    """Per-user application counter by status and month (YYYY-MM)"""
+    __table_args__ = (
+        UniqueConstraint("user_id", "status", "month", name="uq_statuscount_user_status_month"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    status: ApplicationStatus
+    month: str
+    total: int = Field(default=0)
+
+
+class ApplicationStatusEvent(SQLModel, table=True):
+    """Append-only log of job application status changes"""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    application_id: int = Field(index=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    from_status: Optional[ApplicationStatus] = None
+    to_status: ApplicationStatus
+    changed_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 # Pydantic models for API
 class UserCreate(BaseModel):
     """User creation model"""
@@ -57,6 +101,14 @@ class UserRead(BaseModel):
     email: str
     is_active: bool
     created_at: datetime
+    stale_after_days: Optional[int] = None
+    auto_withdraw_stale: bool = False
+
+
+class UserSettingsUpdate(BaseModel):
+    """User settings update model; stale_after_days=null disables the stale sweep"""
+    stale_after_days: Optional[int] = Field(default=None, ge=1)
+    auto_withdraw_stale: Optional[bool] = None
 
 
 class JobApplicationCreate(BaseModel):
@@ -77,6 +129,26 @@ class JobApplicationUpdate(BaseModel):
     notes: Optional[str] = None
 
 
+class JobApplicationFilter(BaseModel):
+    """Filter selecting job applications for bulk updates"""
+    status: Optional[ApplicationStatus] = None
+    company: Optional[str] = None
+    position: Optional[str] = None
+    applied_before: Optional[datetime] = None
+
+
+class JobApplicationBulkUpdate(BaseModel):
+    """Bulk update request model: target ids and/or a filter plus the changes"""
+    ids: Optional[List[int]] = Field(default=None, max_length=1000)
+    filter: Optional[JobApplicationFilter] = None
+    update: JobApplicationUpdate
+
+
+class BulkUpdateResult(BaseModel):
+    """Bulk update response model"""
+    updated_ids: List[int]
+
+
 class JobApplicationRead(BaseModel):
     """Job application response model"""
     id: int
@@ -86,9 +158,46 @@ class JobApplicationRead(BaseModel):
     application_date: datetime
     description: Optional[str] = None
     notes: Optional[str] = None
+    is_stale: bool = False
     user_id: int
 
 
+class ApplicationStats(BaseModel):
+    """Application pipeline summary model"""
+    total: int
+    by_status: Dict[ApplicationStatus, int]
+    by_month: Dict[str, Dict[ApplicationStatus, int]]
+
+
+class FunnelStage(BaseModel):
+    """Single stage of the application funnel"""
+    status: ApplicationStatus
+    reached: int
+    conversion_rate: Optional[float] = None
+    median_days_in_stage: Optional[float] = None
+
+
+class ApplicationFunnel(BaseModel):
+    """Application funnel analytics model"""
+    total: int
+    stages: List[FunnelStage]
+    rejected: int
+    withdrawn: int
+
+
+class ImportRowError(BaseModel):
+    """Validation error for a single imported row"""
+    row: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    """Bulk import summary model"""
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+
+
 class Token(BaseModel):
     """Access token model"""
     access_token: str
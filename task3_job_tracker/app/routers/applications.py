@@ -1,12 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, literal, tuple_, update
 from sqlmodel import Session, select
 from typing import List, Optional
-from ..models import JobApplication, JobApplicationCreate, JobApplicationUpdate, JobApplicationRead, ApplicationStatus, User
+from datetime import datetime
+import base64
+import json
+import tempfile
+from ..models import (
+    JobApplication, JobApplicationCreate, JobApplicationUpdate, JobApplicationRead, ApplicationStatus,
+    ApplicationStats, ApplicationFunnel, ImportResult, ApplicationSort, SortOrder,
+    JobApplicationBulkUpdate, BulkUpdateResult, User
+)
 from ..database import get_session
 from ..auth import get_current_user
+from ..stats import (
+    adjust_status_count, get_status_stats, record_status_event, get_funnel, invalidate_funnel,
+    move_status_counts, record_bulk_status_events, delete_status_events
+)
+from ..transfer import (
+    CSV_CONTENT_TYPES, NDJSON_CONTENT_TYPES, SPOOL_MAX_SIZE,
+    iter_csv_rows, iter_ndjson_rows, import_applications, export_applications_csv, spool_utf8
+)
 
 router = APIRouter(prefix="/applications", tags=["job-applications"])
 
+SORT_COLUMNS = {
+    ApplicationSort.APPLICATION_DATE: JobApplication.application_date,
+    ApplicationSort.COMPANY: JobApplication.company,
+    ApplicationSort.STATUS: JobApplication.status,
+}
+
+
+def _encode_cursor(sort: ApplicationSort, application: JobApplication) -> str:
+    """Encode the sort key of the last returned row as an opaque cursor"""
+    value = getattr(application, sort.value)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, ApplicationStatus):
+        value = value.value
+    payload = json.dumps({"sort": sort.value, "value": value, "id": application.id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(sort: ApplicationSort, cursor: str):
+    """Decode a cursor into the (sort value, id) pair it points after"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if payload["sort"] != sort.value:
+            raise ValueError("cursor was issued for a different sort")
+        value = payload["value"]
+        if sort == ApplicationSort.APPLICATION_DATE:
+            value = datetime.fromisoformat(value)
+        elif sort == ApplicationSort.STATUS:
+            value = ApplicationStatus(value)
+        return value, int(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {str(e)}")
+
+
+def _reject_nulls(application_data: dict):
+    """Refuse explicit nulls for columns that cannot hold them, before anything is written"""
+    columns = JobApplication.__table__.columns
+    invalid = sorted(
+        field for field, value in application_data.items()
+        if value is None and not columns[field].nullable
+    )
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Fields cannot be null: {', '.join(invalid)}"
+        )
+
 
 @router.post("/", response_model=JobApplicationRead)
 def create_job_application(
@@ -20,11 +86,57 @@ def create_job_application(
         user_id=current_user.id
     )
     session.add(db_application)
+    session.flush()
+    adjust_status_count(session, current_user.id, db_application.status, db_application.application_date, 1)
+    record_status_event(session, db_application, None)
     session.commit()
+    invalidate_funnel(current_user.id)
     session.refresh(db_application)
     return db_application
 
 
+@router.post("/import", response_model=ImportResult)
+async def import_job_applications(
+    request: Request,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Bulk import job applications from a CSV or NDJSON body"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in CSV_CONTENT_TYPES:
+        parse_rows = iter_csv_rows
+    elif content_type in NDJSON_CONTENT_TYPES:
+        parse_rows = iter_ndjson_rows
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Body must be CSV (text/csv) or NDJSON (application/x-ndjson)"
+        )
+
+    # Spool the upload so large bodies are never held in memory at once
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as body:
+        try:
+            await spool_utf8(request.stream(), body)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Body must be UTF-8 encoded")
+        result = await run_in_threadpool(
+            import_applications, session, current_user.id, parse_rows(body)
+        )
+
+    invalidate_funnel(current_user.id)
+    return result
+
+
+@router.get("/export")
+def export_job_applications(current_user: User = Depends(get_current_user)):
+    """Stream all job applications of the current user as CSV"""
+    return StreamingResponse(
+        export_applications_csv(current_user.id),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="job_applications.csv"'}
+    )
+
+
 @router.get("/", response_model=List[JobApplicationRead])
 def get_job_applications(
     skip: int = 0,
@@ -44,35 +156,137 @@ def get_job_applications(
 
 @router.get("/search", response_model=List[JobApplicationRead])
 def search_job_applications(
+    response: Response,
     status: Optional[ApplicationStatus] = Query(None, description="Filter by application status"),
     company: Optional[str] = Query(None, description="Filter by company name"),
     position: Optional[str] = Query(None, description="Filter by position"),
+    stale: Optional[bool] = Query(None, description="Filter by the stale flag"),
+    sort: ApplicationSort = Query(ApplicationSort.APPLICATION_DATE, description="Field to sort by"),
+    order: SortOrder = Query(SortOrder.ASC, description="Sort direction"),
+    limit: int = Query(100, ge=1, le=500, description="Maximum number of results"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    include_total: bool = Query(False, description="Return the total match count in X-Total-Count"),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """Search job applications with filters"""
+    """Search job applications with filters, sorting and keyset pagination"""
+    after = _decode_cursor(sort, cursor) if cursor else None
+
     try:
-        query = select(JobApplication).where(JobApplication.user_id == current_user.id)
+        filters = [JobApplication.user_id == current_user.id]
 
         if status:
-            query = query.where(JobApplication.status == status)
+            filters.append(JobApplication.status == status)
 
         if company:
-            query = query.where(JobApplication.company.contains(company))
+            filters.append(JobApplication.company.contains(company))
 
         if position:
-            query = query.where(JobApplication.position.contains(position))
+            filters.append(JobApplication.position.contains(position))
+
+        if stale is not None:
+            filters.append(JobApplication.is_stale == stale)
+
+        # Ties on the sort field are broken by id so pages never overlap
+        sort_column = SORT_COLUMNS[sort]
+        query = select(JobApplication).where(*filters)
+        if after:
+            key = tuple_(sort_column, JobApplication.id)
+            bound = tuple_(literal(after[0], sort_column.type), literal(after[1]))
+            query = query.where(key > bound if order == SortOrder.ASC else key < bound)
+        if order == SortOrder.ASC:
+            query = query.order_by(sort_column, JobApplication.id)
+        else:
+            query = query.order_by(sort_column.desc(), JobApplication.id.desc())
+
+        # Fetch one extra row to know whether another page exists
+        applications = session.exec(query.limit(limit + 1)).all()
+        if len(applications) > limit:
+            applications = applications[:limit]
+            response.headers["X-Next-Cursor"] = _encode_cursor(sort, applications[-1])
+
+        if include_total:
+            total = session.exec(select(func.count()).select_from(JobApplication).where(*filters)).one()
+            response.headers["X-Total-Count"] = str(total)
 
-        applications = session.exec(query).all()
         return applications
 
     except Exception as e:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=400,
             detail=f"Invalid query parameters: {str(e)}"
         )
 
 
+@router.get("/stats", response_model=ApplicationStats)
+def get_job_application_stats(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Get application counts per status and per month"""
+    return get_status_stats(session, current_user.id)
+
+
+@router.get("/funnel", response_model=ApplicationFunnel)
+def get_job_application_funnel(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Get conversion rates and median time spent in each stage"""
+    return get_funnel(session, current_user.id)
+
+
+@router.patch("/bulk", response_model=BulkUpdateResult)
+def bulk_update_job_applications(
+    bulk_update: JobApplicationBulkUpdate,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Apply one partial update to many job applications in a single statement"""
+    filter_conditions = []
+    if bulk_update.filter:
+        if bulk_update.filter.status:
+            filter_conditions.append(JobApplication.status == bulk_update.filter.status)
+        if bulk_update.filter.company:
+            filter_conditions.append(JobApplication.company.contains(bulk_update.filter.company))
+        if bulk_update.filter.position:
+            filter_conditions.append(JobApplication.position.contains(bulk_update.filter.position))
+        if bulk_update.filter.applied_before:
+            filter_conditions.append(JobApplication.application_date < bulk_update.filter.applied_before)
+    # An empty filter ({} or only null/empty values) would match every application the user owns
+    if bulk_update.ids is None and not filter_conditions:
+        raise HTTPException(status_code=400, detail="Provide ids, a filter with at least one criterion, or both")
+
+    application_data = bulk_update.update.dict(exclude_unset=True)
+    if not application_data:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    _reject_nulls(application_data)
+
+    conditions = [JobApplication.user_id == current_user.id, *filter_conditions]
+    if bulk_update.ids is not None:
+        conditions.append(JobApplication.id.in_(bulk_update.ids))
+
+    # Counters and history are maintained set-based from the rows about to change
+    new_status = application_data.get("status")
+    if new_status:
+        move_status_counts(session, current_user.id, conditions, new_status)
+        record_bulk_status_events(session, conditions, new_status)
+        application_data["is_stale"] = False
+
+    updated_ids = session.exec(
+        update(JobApplication)
+        .where(*conditions)
+        .values(**application_data)
+        .returning(JobApplication.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    session.commit()
+
+    if new_status:
+        invalidate_funnel(current_user.id)
+    return BulkUpdateResult(updated_ids=sorted(updated_ids))
+
+
 @router.get("/{application_id}", response_model=JobApplicationRead)
 def get_job_application(
     application_id: int,
@@ -111,12 +325,22 @@ def update_job_application(
     if not application:
         raise HTTPException(status_code=404, detail="Job application not found")
 
+    previous_status = application.status
     application_data = application_update.dict(exclude_unset=True)
+    _reject_nulls(application_data)
     for field, value in application_data.items():
         setattr(application, field, value)
 
+    # Move the application between status counters
+    if application.status != previous_status:
+        application.is_stale = False
+        adjust_status_count(session, current_user.id, previous_status, application.application_date, -1)
+        adjust_status_count(session, current_user.id, application.status, application.application_date, 1)
+        record_status_event(session, application, previous_status)
+
     session.add(application)
     session.commit()
+    invalidate_funnel(current_user.id)
     session.refresh(application)
     return application
 
@@ -139,5 +363,8 @@ def delete_job_application(
         raise HTTPException(status_code=404, detail="Job application not found")
 
     session.delete(application)
+    delete_status_events(session, application_id)
+    adjust_status_count(session, current_user.id, application.status, application.application_date, -1)
     session.commit()
+    invalidate_funnel(current_user.id)
     return {"message": "Job application deleted successfully"}
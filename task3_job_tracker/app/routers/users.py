@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
 from datetime import timedelta
-from ..models import User, UserCreate, UserRead, Token, LoginRequest
+from ..models import User, UserCreate, UserRead, UserSettingsUpdate, Token, LoginRequest
 from ..database import get_session
 from ..auth import get_password_hash, authenticate_user, create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
 
@@ -61,3 +61,31 @@ def login(
 def get_current_user_info(current_user: User = Depends(get_current_user)):
     """Get current user information"""
     return current_user
+
+
+@router.put("/me/settings", response_model=UserRead)
+def update_current_user_settings(
+    settings: UserSettingsUpdate,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Update stale application sweep settings"""
+    settings_data = settings.dict(exclude_unset=True)
+    # stale_after_days=null is meaningful; nulls for NOT NULL columns are not
+    columns = User.__table__.columns
+    invalid = sorted(
+        field for field, value in settings_data.items()
+        if value is None and not columns[field].nullable
+    )
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Fields cannot be null: {', '.join(invalid)}"
+        )
+    for field, value in settings_data.items():
+        setattr(current_user, field, value)
+
+    session.add(current_user)
+    session.commit()
+    session.refresh(current_user)
+    return current_user
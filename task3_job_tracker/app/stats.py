@@ -0,0 +1,272 @@
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import delete, func, literal, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from .models import (
+    ApplicationStatus, ApplicationStatusCount, ApplicationStatusEvent, ApplicationStats,
+    ApplicationFunnel, FunnelStage, JobApplication
+)
+
+# Funnel stages in pipeline order; rejected/withdrawn are terminal outcomes
+FUNNEL_STAGES = [ApplicationStatus.APPLIED, ApplicationStatus.INTERVIEW, ApplicationStatus.OFFER]
+
+# Funnel results per user, dropped on the user's next write
+_funnel_cache: Dict[int, ApplicationFunnel] = {}
+
+# Statuses are stored by enum name, so raw SQL binds the names
+_STATUS_PARAMS = {status.value: status.name for status in ApplicationStatus}
+
+_FUNNEL_REACH_SQL = text("""
+    SELECT
+        COUNT(*) AS total,
+        COALESCE(SUM(max_rank >= 1), 0) AS interview,
+        COALESCE(SUM(max_rank >= 2), 0) AS offer,
+        COALESCE(SUM(was_rejected), 0) AS rejected,
+        COALESCE(SUM(was_withdrawn), 0) AS withdrawn
+    FROM (
+        SELECT
+            e.application_id,
+            MAX(CASE e.to_status WHEN :interview THEN 1 WHEN :offer THEN 2 ELSE 0 END) AS max_rank,
+            MAX(e.to_status = :rejected) AS was_rejected,
+            MAX(e.to_status = :withdrawn) AS was_withdrawn
+        FROM applicationstatusevent e
+        JOIN jobapplication a ON a.id = e.application_id
+        WHERE e.user_id = :user_id AND a.user_id = :user_id
+        GROUP BY e.application_id
+    )
+""")
+
+# Time in a stage is the gap to the application's next event (LEAD); the median
+# is the middle row(s) of each stage's durations ranked with ROW_NUMBER
+_FUNNEL_TIMING_SQL = text("""
+    WITH stage_durations AS (
+        SELECT
+            e.to_status AS status,
+            julianday(LEAD(e.changed_at) OVER w) - julianday(e.changed_at) AS days
+        FROM applicationstatusevent e
+        JOIN jobapplication a ON a.id = e.application_id
+        WHERE e.user_id = :user_id AND a.user_id = :user_id
+        WINDOW w AS (PARTITION BY e.application_id ORDER BY e.changed_at, e.id)
+    ),
+    ranked AS (
+        SELECT
+            status,
+            days,
+            ROW_NUMBER() OVER (PARTITION BY status ORDER BY days) AS rn,
+            COUNT(*) OVER (PARTITION BY status) AS cnt
+        FROM stage_durations
+        WHERE days IS NOT NULL
+    )
+    SELECT status, AVG(days) AS median_days
+    FROM ranked
+    WHERE rn IN ((cnt + 1) / 2, (cnt + 2) / 2)
+    GROUP BY status
+""")
+
+
+def month_key(value: datetime) -> str:
+    """Bucket a date into its YYYY-MM counter month"""
+    return value.strftime("%Y-%m")
+
+
+def adjust_status_count(
+    session: Session,
+    user_id: int,
+    status: ApplicationStatus,
+    application_date: datetime,
+    delta: int
+):
+    """Add delta to a status counter inside the caller's transaction"""
+    adjust_month_count(session, user_id, status, month_key(application_date), delta)
+
+
+def adjust_month_count(
+    session: Session,
+    user_id: int,
+    status: ApplicationStatus,
+    month: str,
+    delta: int
+):
+    """Add delta to the (status, month) counter of a user"""
+    stmt = sqlite_insert(ApplicationStatusCount).values(
+        user_id=user_id,
+        status=status,
+        month=month,
+        total=delta
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "status", "month"],
+        set_={"total": ApplicationStatusCount.total + stmt.excluded.total}
+    )
+    session.execute(stmt)
+
+
+def move_status_counts(session: Session, user_id: int, conditions: list, new_status: ApplicationStatus):
+    """Shift counters for every matching application that changes to new_status"""
+    month = func.strftime("%Y-%m", JobApplication.application_date)
+    grouped = session.exec(
+        select(JobApplication.status, month, func.count())
+        .where(*conditions, JobApplication.status != new_status)
+        .group_by(JobApplication.status, month)
+    ).all()
+    for old_status, bucket, total in grouped:
+        adjust_month_count(session, user_id, old_status, bucket, -total)
+        adjust_month_count(session, user_id, new_status, bucket, total)
+
+
+def rebuild_status_counts(session: Session):
+    """Recompute every status counter from the job application table"""
+    month = func.strftime("%Y-%m", JobApplication.application_date)
+    grouped = (
+        select(JobApplication.user_id, JobApplication.status, month, func.count())
+        .group_by(JobApplication.user_id, JobApplication.status, month)
+    )
+    session.execute(delete(ApplicationStatusCount))
+    session.execute(
+        sqlite_insert(ApplicationStatusCount).from_select(
+            ["user_id", "status", "month", "total"], grouped
+        )
+    )
+    session.commit()
+
+
+def ensure_status_counts(session: Session):
+    """Backfill counters for databases created before they existed"""
+    has_counts = session.exec(select(ApplicationStatusCount.id).limit(1)).first()
+    has_applications = session.exec(select(JobApplication.id).limit(1)).first()
+    if has_applications and not has_counts:
+        rebuild_status_counts(session)
+
+
+def get_status_stats(session: Session, user_id: int) -> ApplicationStats:
+    """Build the pipeline summary for a user from the counter table"""
+    rows = session.exec(
+        select(ApplicationStatusCount).where(
+            ApplicationStatusCount.user_id == user_id,
+            ApplicationStatusCount.total > 0
+        )
+    ).all()
+
+    by_status = {status: 0 for status in ApplicationStatus}
+    by_month = {}
+    for row in rows:
+        by_status[row.status] += row.total
+        by_month.setdefault(row.month, {})[row.status] = row.total
+
+    return ApplicationStats(
+        total=sum(by_status.values()),
+        by_status=by_status,
+        by_month=dict(sorted(by_month.items()))
+    )
+
+
+def record_status_event(
+    session: Session,
+    application: JobApplication,
+    from_status: Optional[ApplicationStatus]
+):
+    """Append a status change for an application to its history"""
+    session.add(ApplicationStatusEvent(
+        application_id=application.id,
+        user_id=application.user_id,
+        from_status=from_status,
+        to_status=application.status
+    ))
+
+
+def record_bulk_status_events(session: Session, conditions: list, new_status: ApplicationStatus):
+    """Append history for every matching application that changes to new_status"""
+    changed = select(
+        JobApplication.id,
+        JobApplication.user_id,
+        JobApplication.status,
+        literal(new_status, JobApplication.status.type),
+        literal(datetime.utcnow())
+    ).where(*conditions, JobApplication.status != new_status)
+    session.execute(
+        sqlite_insert(ApplicationStatusEvent).from_select(
+            ["application_id", "user_id", "from_status", "to_status", "changed_at"], changed
+        )
+    )
+
+
+def delete_status_events(session: Session, application_id: int):
+    """Drop an application's history; SQLite may hand its id to the next application"""
+    session.execute(delete(ApplicationStatusEvent).where(ApplicationStatusEvent.application_id == application_id))
+
+
+def ensure_status_events(session: Session):
+    """Seed one history event per application for pre-existing databases"""
+    has_events = session.exec(select(ApplicationStatusEvent.id).limit(1)).first()
+    has_applications = session.exec(select(JobApplication.id).limit(1)).first()
+    if has_applications and not has_events:
+        seed = select(
+            JobApplication.id,
+            JobApplication.user_id,
+            literal(None),
+            JobApplication.status,
+            JobApplication.application_date
+        )
+        session.execute(
+            sqlite_insert(ApplicationStatusEvent).from_select(
+                ["application_id", "user_id", "from_status", "to_status", "changed_at"], seed
+            )
+        )
+        session.commit()
+
+    # History left behind by deletes made before delete_status_events existed
+    orphaned = session.execute(
+        delete(ApplicationStatusEvent).where(
+            ApplicationStatusEvent.application_id.not_in(select(JobApplication.id))
+        )
+    )
+    if orphaned.rowcount:
+        session.commit()
+
+
+def invalidate_funnel(user_id: int):
+    """Drop a user's cached funnel after a write"""
+    _funnel_cache.pop(user_id, None)
+
+
+def get_funnel(session: Session, user_id: int) -> ApplicationFunnel:
+    """Compute (or return the cached) funnel analytics for a user"""
+    cached = _funnel_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    params = {"user_id": user_id, **_STATUS_PARAMS}
+    reach = session.execute(_FUNNEL_REACH_SQL, params).mappings().one()
+    median_days = {
+        ApplicationStatus[row.status]: round(row.median_days, 2)
+        for row in session.execute(_FUNNEL_TIMING_SQL, params)
+    }
+
+    reached = {
+        ApplicationStatus.APPLIED: reach["total"],
+        ApplicationStatus.INTERVIEW: reach["interview"],
+        ApplicationStatus.OFFER: reach["offer"],
+    }
+    stages = []
+    previous = None
+    for stage in FUNNEL_STAGES:
+        conversion_rate = None
+        if previous is not None and reached[previous]:
+            conversion_rate = round(reached[stage] / reached[previous], 4)
+        stages.append(FunnelStage(
+            status=stage,
+            reached=reached[stage],
+            conversion_rate=conversion_rate,
+            median_days_in_stage=median_days.get(stage)
+        ))
+        previous = stage
+
+    funnel = ApplicationFunnel(
+        total=reach["total"],
+        stages=stages,
+        rejected=reach["rejected"],
+        withdrawn=reach["withdrawn"]
+    )
+    _funnel_cache[user_id] = funnel
+    return funnel
@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlmodel import Session, select
+from .database import engine
+from .models import ApplicationStatus, JobApplication, User
+from .stats import invalidate_funnel, move_status_counts, record_bulk_status_events
+
+STALE_SWEEP_INTERVAL_SECONDS = 3600
+STALE_SWEEP_BATCH_SIZE = 500
+STALE_STATUSES = [ApplicationStatus.APPLIED, ApplicationStatus.INTERVIEW]
+
+logger = logging.getLogger(__name__)
+
+# Exposed on /health
+sweeper_metrics = {
+    "runs": 0,
+    "last_run_at": None,
+    "last_run_duration_ms": None,
+    "last_run_flagged": 0,
+    "last_run_withdrawn": 0,
+    "total_flagged": 0,
+    "total_withdrawn": 0,
+    "last_error": None,
+}
+
+_stop_event = threading.Event()
+_thread = None
+
+
+def _next_stale_batch(session: Session, user: User, cutoff: datetime) -> list:
+    """Ids of the user's next batch of stale applications"""
+    # Walks the (user_id, status, application_date) index
+    query = select(JobApplication.id).where(
+        JobApplication.user_id == user.id,
+        JobApplication.status.in_(STALE_STATUSES),
+        JobApplication.application_date < cutoff
+    )
+    if not user.auto_withdraw_stale:
+        # Withdrawal also takes rows flagged before auto-withdraw was turned on
+        query = query.where(JobApplication.is_stale == False)  # noqa: E712
+    return session.exec(query.limit(STALE_SWEEP_BATCH_SIZE)).all()
+
+
+def sweep_user(session: Session, user: User, now: datetime) -> int:
+    """Flag (or withdraw) one user's stale applications in batches"""
+    cutoff = now - timedelta(days=user.stale_after_days)
+    swept = 0
+    while True:
+        batch = _next_stale_batch(session, user, cutoff)
+        if not batch:
+            break
+
+        conditions = [JobApplication.user_id == user.id, JobApplication.id.in_(batch)]
+        values = {"is_stale": True}
+        if user.auto_withdraw_stale:
+            move_status_counts(session, user.id, conditions, ApplicationStatus.WITHDRAWN)
+            record_bulk_status_events(session, conditions, ApplicationStatus.WITHDRAWN)
+            # A status change clears the flag, as it does for user edits
+            values = {"status": ApplicationStatus.WITHDRAWN, "is_stale": False}
+
+        session.exec(
+            update(JobApplication)
+            .where(*conditions)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        swept += len(batch)
+
+    if swept and user.auto_withdraw_stale:
+        invalidate_funnel(user.id)
+    return swept
+
+
+def sweep_stale_applications():
+    """Run one sweep over every user with a staleness threshold"""
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    flagged = 0
+    withdrawn = 0
+
+    with Session(engine) as session:
+        users = session.exec(select(User).where(User.stale_after_days != None)).all()  # noqa: E711
+        for user in users:
+            swept = sweep_user(session, user, now)
+            if user.auto_withdraw_stale:
+                withdrawn += swept
+            else:
+                flagged += swept
+
+    sweeper_metrics["runs"] += 1
+    sweeper_metrics["last_run_at"] = now
+    sweeper_metrics["last_run_duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    sweeper_metrics["last_run_flagged"] = flagged
+    sweeper_metrics["last_run_withdrawn"] = withdrawn
+    sweeper_metrics["total_flagged"] += flagged
+    sweeper_metrics["total_withdrawn"] += withdrawn
+
+
+def _run_sweeper():
+    """Scheduler loop: sweep, then wait for the interval or a stop request"""
+    while not _stop_event.is_set():
+        try:
+            sweep_stale_applications()
+            sweeper_metrics["last_error"] = None
+        except Exception as e:
+            logger.exception("Stale application sweep failed")
+            sweeper_metrics["last_error"] = str(e)
+        _stop_event.wait(STALE_SWEEP_INTERVAL_SECONDS)
+
+
+def start_sweeper():
+    """Start the background sweeper thread"""
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop_event.clear()
+    _thread = threading.Thread(target=_run_sweeper, name="stale-sweeper", daemon=True)
+    _thread.start()
+
+
+def stop_sweeper():
+    """Signal the sweeper thread to stop and wait for it"""
+    _stop_event.set()
+    if _thread:
+        _thread.join(timeout=5)
@@ -0,0 +1,140 @@
+import codecs
+import csv
+import io
+import json
+from collections import Counter
+from typing import IO, AsyncIterator, Iterator, Tuple
+from pydantic import ValidationError
+from sqlmodel import Session, select
+from .database import engine
+from .models import JobApplication, JobApplicationCreate, ImportResult, ImportRowError
+from .stats import adjust_month_count, month_key, record_status_event
+
+IMPORT_CHUNK_SIZE = 500
+EXPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+SPOOL_MAX_SIZE = 1024 * 1024  # request bodies above 1 MB are spooled to disk
+
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+EXPORT_COLUMNS = ["id", "company", "position", "status", "application_date", "description", "notes"]
+
+
+async def spool_utf8(chunks: AsyncIterator[bytes], body: IO[bytes]):
+    """Copy an upload into body, raising UnicodeDecodeError if it is not UTF-8"""
+    # Checked before parsing, so a bad byte never leaves earlier chunks committed
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    async for chunk in chunks:
+        decoder.decode(chunk)
+        body.write(chunk)
+    decoder.decode(b"", final=True)
+    body.seek(0)
+
+
+def iter_csv_rows(body: IO[bytes]) -> Iterator[Tuple[int, dict]]:
+    """Yield (row number, fields) from a CSV body, dropping empty cells"""
+    reader = csv.DictReader(codecs.iterdecode(body, "utf-8-sig"))
+    for row_number, row in enumerate(reader, start=1):
+        yield row_number, {
+            key.strip(): value for key, value in row.items()
+            if key and value not in (None, "")
+        }
+
+
+def iter_ndjson_rows(body: IO[bytes]) -> Iterator[Tuple[int, dict]]:
+    """Yield (row number, fields) from a newline-delimited JSON body"""
+    for row_number, line in enumerate(codecs.iterdecode(body, "utf-8-sig"), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield row_number, json.loads(line)
+        except json.JSONDecodeError:
+            # Reported by import_applications as an invalid row
+            yield row_number, None
+
+
+def _insert_chunk(session: Session, user_id: int, chunk: list):
+    """Insert one chunk of validated applications in a single transaction"""
+    applications = [JobApplication(**row.dict(), user_id=user_id) for row in chunk]
+    session.add_all(applications)
+    session.flush()
+
+    # One counter upsert per (status, month) instead of one per row
+    totals = Counter(
+        (application.status, month_key(application.application_date))
+        for application in applications
+    )
+    for (status, month), total in totals.items():
+        adjust_month_count(session, user_id, status, month, total)
+
+    for application in applications:
+        record_status_event(session, application, None)
+    session.commit()
+
+
+def import_applications(session: Session, user_id: int, rows: Iterator[Tuple[int, dict]]) -> ImportResult:
+    """Validate rows against JobApplicationCreate and insert them in chunks"""
+    imported = 0
+    errors = []
+    failed = 0
+    chunk = []
+
+    for row_number, fields in rows:
+        if not isinstance(fields, dict):
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(ImportRowError(row=row_number, error="Row is not a valid JSON object"))
+            continue
+        try:
+            application = JobApplicationCreate(**fields)
+        except ValidationError as e:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(ImportRowError(row=row_number, error=str(e)))
+            continue
+
+        chunk.append(application)
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            _insert_chunk(session, user_id, chunk)
+            imported += len(chunk)
+            chunk = []
+
+    if chunk:
+        _insert_chunk(session, user_id, chunk)
+        imported += len(chunk)
+
+    return ImportResult(imported=imported, failed=failed, errors=errors)
+
+
+def export_applications_csv(user_id: int) -> Iterator[str]:
+    """Stream a user's applications as CSV, fetching rows in batches"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+
+    # Own session: the stream outlives the request's dependency session
+    with Session(engine) as session:
+        result = session.exec(
+            select(JobApplication)
+            .where(JobApplication.user_id == user_id)
+            .order_by(JobApplication.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for batch in result.partitions():
+            for application in batch:
+                writer.writerow([
+                    application.id,
+                    application.company,
+                    application.position,
+                    application.status.value,
+                    application.application_date.isoformat(),
+                    application.description or "",
+                    application.notes or ""
+                ])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
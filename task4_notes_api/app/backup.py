@@ -0,0 +1,294 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import delete, func, insert
+from sqlmodel import Session, select
+from .database import engine, create_db_and_tables
+from .models import Note, NoteRevision
+
+BACKUP_FILE = "notes.json"
+CHANGE_LOG_FILE = "notes.changes.jsonl"
+
+DEBOUNCE_SECONDS = 0.5           # window in which bursts of writes are coalesced
+SNAPSHOT_INTERVAL_SECONDS = 300  # compact the change log at least this often
+SNAPSHOT_MAX_LOG_RECORDS = 1000  # ...or once it holds this many records
+SNAPSHOT_BATCH_SIZE = 500
+RESTORE_CHUNK_SIZE = 500         # notes inserted per transaction on restore
+RESTORE_READ_SIZE = 64 * 1024    # bytes of notes.json read at a time on restore
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_queue = queue.Queue()
+_thread = None
+
+
+def note_to_dict(note: Note) -> dict:
+    """Serialize a note the way it appears in the backup"""
+    return {
+        "id": note.id,
+        "title": note.title,
+        "content": note.content,
+        "created_at": note.created_at.isoformat(),
+        "updated_at": note.updated_at.isoformat()
+    }
+
+
+def enqueue_note_saved(note: Note):
+    """Queue a created or updated note for backup"""
+    _queue.put({"op": "upsert", "id": note.id, "note": note_to_dict(note)})
+
+
+def enqueue_note_deleted(note_id: int):
+    """Queue a deleted note for backup"""
+    _queue.put({"op": "delete", "id": note_id})
+
+
+def enqueue_notes_changed(saved: list, deleted_ids: list):
+    """Queue the outcome of a batch as one backup item"""
+    records = [{"op": "upsert", "id": note.id, "note": note_to_dict(note)} for note in saved]
+    records += [{"op": "delete", "id": note_id} for note_id in deleted_ids]
+    if records:
+        _queue.put(records)
+
+
+def _coalesce(records: list) -> list:
+    """Keep only the last change per note, in the order notes last changed"""
+    latest = {}
+    for record in records:
+        latest.pop(record["id"], None)
+        latest[record["id"]] = record
+    return list(latest.values())
+
+
+def _append_to_change_log(records: list):
+    """Append change records to the log in a single write"""
+    lines = "".join(json.dumps(record) + "\n" for record in records)
+    with open(CHANGE_LOG_FILE, "a") as f:
+        f.write(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_snapshot():
+    """Write a compacted notes.json from the database and reset the change log"""
+    tmp_file = BACKUP_FILE + ".tmp"
+    with Session(engine) as session, open(tmp_file, "w") as f:
+        f.write("[")
+        first = True
+        result = session.exec(
+            select(Note).order_by(Note.id).execution_options(yield_per=SNAPSHOT_BATCH_SIZE)
+        )
+        for note in result:
+            item = json.dumps(note_to_dict(note), indent=2).replace("\n", "\n  ")
+            f.write(("\n  " if first else ",\n  ") + item)
+            first = False
+        f.write("\n]" if not first else "]")
+        f.flush()
+        os.fsync(f.fileno())
+
+    # Readers see either the old or the new snapshot, never a partial one
+    os.replace(tmp_file, BACKUP_FILE)
+    # Records queued after the snapshot was read are re-applied on restore;
+    # replay is idempotent, so overlap with the snapshot is harmless
+    open(CHANGE_LOG_FILE, "w").close()
+
+
+def _count_change_log_records() -> int:
+    """Number of records left in the change log by a previous run"""
+    if not os.path.exists(CHANGE_LOG_FILE):
+        return 0
+    with open(CHANGE_LOG_FILE) as f:
+        return sum(1 for _ in f)
+
+
+def _run_backup_worker():
+    """Drain the queue, coalescing bursts into single change log appends"""
+    pending_records = _count_change_log_records()
+    first_pending_at = time.monotonic()
+    stopping = False
+
+    while not stopping:
+        # Idle until the next change, or until a pending snapshot is due
+        timeout = None
+        if pending_records:
+            timeout = max(0.0, SNAPSHOT_INTERVAL_SECONDS - (time.monotonic() - first_pending_at))
+        try:
+            records = [_queue.get(timeout=timeout)]
+        except queue.Empty:
+            records = []
+
+        # Debounce: collect everything arriving within the window
+        deadline = time.monotonic() + DEBOUNCE_SECONDS
+        while records and records[-1] is not _STOP and (remaining := deadline - time.monotonic()) > 0:
+            try:
+                records.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        if _STOP in records:
+            stopping = True
+            records = [r for r in records if r is not _STOP]
+        # Batches arrive as one list of records
+        records = [r for item in records for r in (item if isinstance(item, list) else [item])]
+
+        try:
+            if records:
+                changes = _coalesce(records)
+                _append_to_change_log(changes)
+                if not pending_records:
+                    first_pending_at = time.monotonic()
+                pending_records += len(changes)
+
+            snapshot_due = time.monotonic() - first_pending_at >= SNAPSHOT_INTERVAL_SECONDS
+            if pending_records and (stopping or snapshot_due or pending_records >= SNAPSHOT_MAX_LOG_RECORDS):
+                write_snapshot()
+                pending_records = 0
+        except Exception:
+            logger.exception("Notes backup failed")
+
+
+def start_backup_worker():
+    """Start the background backup thread"""
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _thread = threading.Thread(target=_run_backup_worker, name="notes-backup", daemon=True)
+    _thread.start()
+
+
+def stop_backup_worker():
+    """Flush pending changes, write a final snapshot and stop the thread"""
+    if _thread and _thread.is_alive():
+        _queue.put(_STOP)
+        _thread.join(timeout=30)
+
+
+def _read_change_log():
+    """Yield change records from the log, skipping a torn final line"""
+    if not os.path.exists(CHANGE_LOG_FILE):
+        return
+    with open(CHANGE_LOG_FILE) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Skipping unreadable change log line")
+
+
+def iter_snapshot(path: str = BACKUP_FILE):
+    """Yield the notes of a JSON array file one at a time, reading it in chunks"""
+    decoder = json.JSONDecoder()
+    with open(path) as f:
+        buffer, position, eof = "", 0, False
+        started = False
+        read_size = RESTORE_READ_SIZE
+        while True:
+            # Skip whitespace and the array punctuation between items
+            while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+                if buffer[position] == "[":
+                    started = True
+                position += 1
+            if position < len(buffer):
+                if not started:
+                    raise ValueError(f"{path} does not contain a JSON array")
+                try:
+                    item, position = decoder.raw_decode(buffer, position)
+                    read_size = RESTORE_READ_SIZE
+                    yield item
+                    continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    # Item continues past the buffer; read more, growing the
+                    # read so a huge note is not re-parsed once per small chunk
+                    read_size = max(read_size, len(buffer) - position)
+            elif eof:
+                return
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+
+def _insert_notes(notes: list) -> int:
+    """Insert one chunk of notes in its own transaction"""
+    with Session(engine) as session:
+        session.exec(insert(Note), params=[
+            {
+                "id": data["id"],
+                "title": data["title"],
+                "content": data["content"],
+                "created_at": datetime.fromisoformat(data["created_at"]),
+                "updated_at": datetime.fromisoformat(data["updated_at"]),
+            }
+            for data in notes
+        ])
+        session.commit()
+    return len(notes)
+
+
+def restore_notes() -> int:
+    """Replace the notes table with the snapshot plus the change log"""
+    create_db_and_tables()
+
+    # The change log is small (it is compacted into the snapshot regularly);
+    # its last record per note overrides the snapshot
+    changes = {record["id"]: record for record in _coalesce(list(_read_change_log()))}
+
+    with Session(engine) as session:
+        session.exec(delete(Note))
+        # History no longer matches the restored notes
+        session.exec(delete(NoteRevision))
+        session.commit()
+
+    restored = 0
+    chunk = []
+    snapshot = iter_snapshot() if os.path.exists(BACKUP_FILE) else []
+    for data in snapshot:
+        if data["id"] in changes:
+            continue
+        chunk.append(data)
+        if len(chunk) >= RESTORE_CHUNK_SIZE:
+            restored += _insert_notes(chunk)
+            chunk = []
+    chunk.extend(record["note"] for record in changes.values() if record["op"] == "upsert")
+    for start in range(0, len(chunk), RESTORE_CHUNK_SIZE):
+        restored += _insert_notes(chunk[start:start + RESTORE_CHUNK_SIZE])
+
+    with Session(engine) as session:
+        total = session.exec(select(func.count(Note.id))).one()
+    if total != restored:
+        raise RuntimeError(f"Restore verification failed: inserted {restored} notes but the table holds {total}")
+    return restored
+
+
+def restore_if_empty() -> Optional[int]:
+    """Restore from the backup on startup when NOTES_RESTORE_ON_STARTUP is set and there are no notes"""
+    if os.environ.get("NOTES_RESTORE_ON_STARTUP", "").lower() not in ("1", "true", "yes"):
+        return None
+    with Session(engine) as session:
+        if session.exec(select(Note.id).limit(1)).first() is not None:
+            return None
+    restored = restore_notes()
+    logger.info("Restored %d notes from %s", restored, BACKUP_FILE)
+    return restored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Notes backup maintenance")
+    parser.add_argument("command", choices=["restore", "snapshot"])
+    args = parser.parse_args()
+
+    if args.command == "restore":
+        print(f"Restored {restore_notes()} notes from {BACKUP_FILE} and {CHANGE_LOG_FILE}")
+    else:
+        create_db_and_tables()
+        write_snapshot()
+        print(f"Wrote snapshot to {BACKUP_FILE}")
@@ -0,0 +1,85 @@
+from datetime import datetime
+from typing import Dict, List, Tuple
+from sqlmodel import Session, select
+from .etags import note_etag, etag_matches
+from .models import Note, NoteBatchOp, NoteBatchOperation, NoteBatchResult
+from .revisions import ensure_base_revision, record_revision, delete_revisions
+from .sync import record_tombstone
+
+
+def _failed(index: int, operation: NoteBatchOperation, status: int, error: str) -> NoteBatchResult:
+    return NoteBatchResult(index=index, op=operation.op, status=status, id=operation.id, error=error)
+
+
+def _create(session: Session, operation: NoteBatchOperation) -> Note:
+    note = Note(title=operation.title, content=operation.content)
+    session.add(note)
+    session.flush()
+    record_revision(session, note, None)
+    return note
+
+
+def _update(session: Session, note: Note, operation: NoteBatchOperation):
+    ensure_base_revision(session, note)
+    previous_title, previous_content = note.title, note.content
+    changes = operation.dict(include={"title", "content"}, exclude_none=True)
+    for field, value in changes.items():
+        setattr(note, field, value)
+    if (note.title, note.content) != (previous_title, previous_content):
+        record_revision(session, note, previous_content)
+    note.updated_at = datetime.utcnow()
+    session.add(note)
+
+
+def _delete(session: Session, note: Note):
+    session.delete(note)
+    delete_revisions(session, note.id)
+    record_tombstone(session, note.id)
+
+
+def apply_batch(session: Session, operations: List[NoteBatchOperation]) -> Tuple[List[NoteBatchResult], List[Note], List[int]]:
+    """Apply operations in order within the session's transaction.
+
+    Returns per-operation results plus the notes saved and ids deleted, for
+    the caller to commit and back up. Failed operations change nothing.
+    """
+    # Load every referenced note in one query; session.get then hits the identity map
+    ids = {operation.id for operation in operations if operation.id is not None}
+    if ids:
+        session.exec(select(Note).where(Note.id.in_(ids))).all()
+
+    results = []
+    saved: Dict[int, Note] = {}
+    deleted = []
+    for index, operation in enumerate(operations):
+        if operation.op == NoteBatchOp.CREATE:
+            if operation.title is None or operation.content is None:
+                results.append(_failed(index, operation, 422, "create needs title and content"))
+                continue
+            note = _create(session, operation)
+            saved[note.id] = note
+            results.append(NoteBatchResult(index=index, op=operation.op, status=201, id=note.id))
+            continue
+
+        if operation.id is None:
+            results.append(_failed(index, operation, 422, f"{operation.op.value} needs id"))
+            continue
+        note = session.get(Note, operation.id)
+        if not note or operation.id in deleted:
+            results.append(_failed(index, operation, 404, "Note not found"))
+            continue
+        if operation.if_match and not etag_matches(operation.if_match, note_etag(note.id, note.updated_at), weak=False):
+            results.append(_failed(index, operation, 412, "Note has been modified"))
+            continue
+
+        if operation.op == NoteBatchOp.UPDATE:
+            _update(session, note, operation)
+            saved[note.id] = note
+            results.append(NoteBatchResult(index=index, op=operation.op, status=200, id=note.id))
+        else:
+            _delete(session, note)
+            saved.pop(note.id, None)
+            deleted.append(note.id)
+            results.append(NoteBatchResult(index=index, op=operation.op, status=200, id=note.id))
+
+    return results, list(saved.values()), deleted
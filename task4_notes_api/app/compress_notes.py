@@ -0,0 +1,104 @@
+import argparse
+import os
+import random
+import statistics
+import time
+from sqlalchemy import text
+from sqlmodel import Session
+from .compression import COMPRESSION_CODEC, COMPRESSION_THRESHOLD, compress_text
+from .database import engine, create_db_and_tables, DATABASE_URL
+from .models import Note
+
+MIGRATION_BATCH_SIZE = 100
+BENCH_READS = 500
+
+DATABASE_FILE = DATABASE_URL.replace("sqlite:///", "")
+
+
+def migrate(vacuum: bool = True) -> int:
+    """Compress existing large plain-text notes, one transaction per batch"""
+    migrated = 0
+    last_id = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(text("""
+                SELECT id, content, change_seq FROM note
+                WHERE id > :last_id
+                  AND typeof(content) = 'text'
+                  AND length(CAST(content AS BLOB)) >= :threshold
+                ORDER BY id
+                LIMIT :batch
+            """), {"last_id": last_id, "threshold": COMPRESSION_THRESHOLD, "batch": MIGRATION_BATCH_SIZE}).all()
+            if not rows:
+                break
+
+            updates = []
+            for note_id, content, change_seq in rows:
+                stored = compress_text(content)
+                if isinstance(stored, bytes):
+                    updates.append({"id": note_id, "content": stored, "change_seq": change_seq})
+            if updates:
+                connection.execute(text("UPDATE note SET content = :content WHERE id = :id"), updates)
+                # Re-encoding is not an edit: undo the change_seq bump from the trigger,
+                # so sync clients do not download every migrated note again
+                connection.execute(text("UPDATE note SET change_seq = :change_seq WHERE id = :id"), updates)
+
+            migrated += len(updates)
+            last_id = rows[-1][0]
+
+    if vacuum:
+        # Hand the freed pages back to the filesystem
+        with engine.connect() as connection:
+            connection.exec_driver_sql("VACUUM")
+    return migrated
+
+
+def bench() -> dict:
+    """DB size, storage mix and single-note read latency"""
+    with engine.connect() as connection:
+        stats = connection.execute(text("""
+            SELECT
+                COUNT(*) AS notes,
+                COALESCE(SUM(typeof(content) = 'blob'), 0) AS compressed,
+                COALESCE(SUM(length(CAST(content AS BLOB))), 0) AS stored_bytes
+            FROM note
+        """)).mappings().one()
+        ids = [row[0] for row in connection.execute(text("SELECT id FROM note"))]
+
+    latencies = []
+    with Session(engine) as session:
+        for note_id in random.choices(ids, k=BENCH_READS) if ids else []:
+            started = time.perf_counter()
+            note = session.get(Note, note_id)
+            note.content
+            latencies.append(time.perf_counter() - started)
+            # Force a real read from the database every time
+            session.expunge(note)
+
+    latencies.sort()
+    return {
+        "codec": COMPRESSION_CODEC,
+        "threshold_bytes": COMPRESSION_THRESHOLD,
+        "db_file_bytes": os.path.getsize(DATABASE_FILE),
+        "notes": stats["notes"],
+        "compressed_notes": stats["compressed"],
+        "stored_content_bytes": stats["stored_bytes"],
+        "read_p50_ms": round(statistics.median(latencies) * 1000, 3) if latencies else None,
+        "read_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 3) if latencies else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Note body compression maintenance")
+    parser.add_argument("command", choices=["migrate", "bench"])
+    parser.add_argument("--no-vacuum", action="store_true", help="skip VACUUM after migrating")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    if args.command == "migrate":
+        before = os.path.getsize(DATABASE_FILE)
+        migrated = migrate(vacuum=not args.no_vacuum)
+        print(f"Compressed {migrated} notes; {DATABASE_FILE}: {before} -> {os.path.getsize(DATABASE_FILE)} bytes")
+    else:
+        for key, value in bench().items():
+            print(f"{key}: {value}")
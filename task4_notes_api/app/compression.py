@@ -0,0 +1,49 @@
+import lzma
+import os
+import zlib
+from sqlalchemy.types import TypeDecorator, Text
+
+# Note bodies larger than this many bytes are compressed at rest
+COMPRESSION_THRESHOLD = int(os.getenv("NOTES_COMPRESSION_THRESHOLD", "4096"))
+# zlib is faster to read; lzma is smaller
+COMPRESSION_CODEC = os.getenv("NOTES_COMPRESSION_CODEC", "zlib")
+
+# First byte of a compressed value marks its format; plain values stay TEXT
+CODECS = {
+    "zlib": (b"Z", lambda data: zlib.compress(data, 6), zlib.decompress),
+    "lzma": (b"X", lzma.compress, lzma.decompress),
+}
+DECOMPRESSORS = {marker: decompress for marker, _, decompress in CODECS.values()}
+
+
+def compress_text(value: str):
+    """Compressed bytes for large text, or the text itself when small or incompressible"""
+    encoded = value.encode()
+    if len(encoded) < COMPRESSION_THRESHOLD:
+        return value
+    marker, compress, _ = CODECS[COMPRESSION_CODEC]
+    compressed = marker + compress(encoded)
+    return compressed if len(compressed) < len(encoded) else value
+
+
+def decompress_text(value):
+    """Inverse of compress_text; also registered as the note_text() SQL function"""
+    if isinstance(value, bytes):
+        return DECOMPRESSORS[value[:1]](value[1:]).decode()
+    return value
+
+
+class CompressedText(TypeDecorator):
+    """Text column stored compressed (as a marked BLOB) above the threshold"""
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress_text(value)
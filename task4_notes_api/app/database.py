@@ -1,5 +1,7 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event, inspect, text
 from typing import Generator
+from .compression import decompress_text
 
 # Database configuration
 DATABASE_URL = "sqlite:///./notes.db"
@@ -7,9 +9,106 @@ DATABASE_URL = "sqlite:///./notes.db"
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 
 
+@event.listens_for(engine, "connect")
+def register_functions(dbapi_connection, connection_record):
+    """Let SQL (search index triggers and view) read compressed note bodies"""
+    dbapi_connection.create_function("note_text", 1, decompress_text, deterministic=True)
+
+
+# FTS5 index over note title/content, kept in sync by triggers. It reads
+# through a view that decompresses content, so it always sees plain text.
+SEARCH_SOURCE = "note_search_source"
+SEARCH_INDEX_DDL = [
+    f"""CREATE VIEW {SEARCH_SOURCE} AS
+        SELECT id, title, note_text(content) AS content FROM note""",
+    f"""CREATE VIRTUAL TABLE note_fts USING fts5(
+        title, content, content='{SEARCH_SOURCE}', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER note_fts_insert AFTER INSERT ON note BEGIN
+        INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, note_text(new.content));
+    END""",
+    """CREATE TRIGGER note_fts_delete AFTER DELETE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, note_text(old.content));
+    END""",
+    """CREATE TRIGGER note_fts_update AFTER UPDATE OF title, content ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, note_text(old.content));
+        INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, note_text(new.content));
+    END""",
+    # Index notes that existed before the search index
+    "INSERT INTO note_fts(note_fts) VALUES ('rebuild')",
+]
+# Objects of an older index layout that read note.content directly
+LEGACY_SEARCH_OBJECTS = [
+    "DROP TRIGGER IF EXISTS note_fts_insert",
+    "DROP TRIGGER IF EXISTS note_fts_delete",
+    "DROP TRIGGER IF EXISTS note_fts_update",
+    "DROP TABLE IF EXISTS note_fts",
+    f"DROP VIEW IF EXISTS {SEARCH_SOURCE}",
+]
+
+
+def create_search_index():
+    """Create (or upgrade) the full-text search index"""
+    with engine.begin() as connection:
+        existing = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE name = 'note_fts'")
+        ).scalar()
+        if existing and SEARCH_SOURCE in existing:
+            return
+        for statement in LEGACY_SEARCH_OBJECTS + SEARCH_INDEX_DDL:
+            connection.exec_driver_sql(statement)
+
+
+# Every insert or edit of a note takes the next number from notechangecounter.
+# SQLite holds the write lock from that statement until commit, so numbers
+# become visible in order, unlike updated_at, which is set before commit.
+CHANGE_SEQUENCE_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS note_change_seq_insert AFTER INSERT ON note BEGIN
+        UPDATE notechangecounter SET value = value + 1 WHERE id = 1;
+        UPDATE note SET change_seq = (SELECT value FROM notechangecounter WHERE id = 1) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS note_change_seq_update AFTER UPDATE OF title, content, updated_at ON note BEGIN
+        UPDATE notechangecounter SET value = value + 1 WHERE id = 1;
+        UPDATE note SET change_seq = (SELECT value FROM notechangecounter WHERE id = 1) WHERE id = new.id;
+    END""",
+]
+
+
+def create_change_sequence():
+    """Add (or upgrade to) the change_seq column, its counter and triggers"""
+    with engine.begin() as connection:
+        columns = {column["name"] for column in inspect(connection).get_columns("note")}
+        if "change_seq" not in columns:
+            connection.exec_driver_sql("ALTER TABLE note ADD COLUMN change_seq INTEGER")
+        # Number notes written before the sequence existed, oldest first
+        base = connection.execute(text("SELECT COALESCE(MAX(change_seq), 0) FROM note")).scalar()
+        connection.execute(text("""
+            UPDATE note SET change_seq = :base + ordered.position
+            FROM (SELECT id, ROW_NUMBER() OVER (ORDER BY updated_at, id) AS position
+                  FROM note WHERE change_seq IS NULL) AS ordered
+            WHERE ordered.id = note.id
+        """), {"base": base})
+        connection.exec_driver_sql("INSERT OR IGNORE INTO notechangecounter (id, value) VALUES (1, 0)")
+        connection.exec_driver_sql("""
+            UPDATE notechangecounter
+            SET value = MAX(value, COALESCE((SELECT MAX(change_seq) FROM note), 0))
+            WHERE id = 1
+        """)
+        for statement in CHANGE_SEQUENCE_DDL:
+            connection.exec_driver_sql(statement)
+
+
 def create_db_and_tables():
     """Create database and tables"""
     SQLModel.metadata.create_all(engine)
+    create_change_sequence()
+    # create_all skips indexes of tables that already exist
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    create_search_index()
 
 
 def get_session() -> Generator[Session, None, None]:
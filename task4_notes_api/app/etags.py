@@ -0,0 +1,85 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import HTTPException, Response
+from sqlalchemy import func
+from sqlmodel import Session, select
+from .models import Note
+
+
+def note_etag(note_id: int, updated_at: datetime) -> str:
+    """Strong ETag for one note, derived from its id and last update"""
+    digest = hashlib.sha1(f"{note_id}:{updated_at.isoformat()}".encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def collection_etag(session: Session, skip: int, limit: int) -> str:
+    """ETag for a page of the note list, from a cheap aggregate over the table"""
+    total, last_update, last_id = session.exec(
+        select(func.count(Note.id), func.max(Note.updated_at), func.max(Note.id))
+    ).one()
+    version = f"{total}:{last_update}:{last_id}:{skip}:{limit}"
+    return f'"{hashlib.sha1(version.encode()).hexdigest()[:20]}"'
+
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime for Last-Modified"""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def _etag_list(header: str, weak: bool) -> list:
+    tags = [tag.strip() for tag in header.split(",") if tag.strip()]
+    if weak:
+        # Weak comparison: W/"x" matches "x"
+        return [tag.removeprefix("W/") for tag in tags]
+    # Strong comparison: weak tags never match
+    return [tag for tag in tags if not tag.startswith("W/")]
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    """Whether an If-None-Match (weak) / If-Match (strong, RFC 9110) header lists the given ETag"""
+    if not header:
+        return False
+    tags = _etag_list(header, weak)
+    return "*" in tags or etag in tags
+
+
+def not_modified_since(header: Optional[str], updated_at: datetime) -> bool:
+    """Whether the resource is unchanged since an If-Modified-Since date"""
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    return updated_at.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def is_not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: str,
+    updated_at: Optional[datetime] = None
+) -> bool:
+    """Evaluate conditional GET headers; If-None-Match takes precedence"""
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    return updated_at is not None and not_modified_since(if_modified_since, updated_at)
+
+
+def not_modified(etag: str, updated_at: Optional[datetime] = None) -> Response:
+    """Empty 304 response carrying the current validators"""
+    headers = {"ETag": etag}
+    if updated_at is not None:
+        headers["Last-Modified"] = http_date(updated_at)
+    return Response(status_code=304, headers=headers)
+
+
+def check_if_match(if_match: Optional[str], etag: str):
+    """Reject a write whose If-Match does not name the current version"""
+    if if_match and not etag_matches(if_match, etag, weak=False):
+        raise HTTPException(status_code=412, detail="Note has been modified")
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from typing import AsyncIterator, Optional, Set
+
+CLIENT_BUFFER_SIZE = 256        # events queued per client before it is dropped as too slow
+REPLAY_BUFFER_SIZE = 1000       # recent events kept for Last-Event-ID resume
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+
+event_metrics = {
+    "clients": 0,
+    "published": 0,
+    "dropped_clients": 0,
+}
+
+# Event ids are "<boot>-<sequence>"; ids from another process run cannot be resumed
+_BOOT = os.urandom(4).hex()
+_DISCONNECT = object()
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_clients: Set[asyncio.Queue] = set()
+_replay = deque(maxlen=REPLAY_BUFFER_SIZE)
+_lock = threading.Lock()
+_sequence = 0
+
+
+def _format(sequence: int, event_type: str, data: str) -> str:
+    """Encode one server-sent event"""
+    return f"id: {_BOOT}-{sequence}\nevent: {event_type}\ndata: {data}\n\n"
+
+
+def _deliver(sequence: int, message: str):
+    """Fan a message out to every client; runs on the event loop"""
+    for client in list(_clients):
+        try:
+            client.put_nowait((sequence, message))
+        except asyncio.QueueFull:
+            # A slow client must not hold events for everyone: drop it and
+            # let it reconnect with Last-Event-ID to replay what it missed
+            _clients.discard(client)
+            client.get_nowait()
+            client.put_nowait(_DISCONNECT)
+            event_metrics["dropped_clients"] += 1
+
+
+def publish(event_type: str, payload: dict):
+    """Broadcast an event; safe to call from request threads"""
+    global _sequence
+    data = json.dumps(payload, default=str)
+    with _lock:
+        _sequence += 1
+        sequence = _sequence
+        message = _format(sequence, event_type, data)
+        _replay.append((sequence, message))
+        event_metrics["published"] += 1
+    if _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_deliver, sequence, message)
+
+
+def publish_note_saved(note, created: bool = False):
+    """Broadcast a created or updated note"""
+    publish("created" if created else "updated", {"note": note.model_dump(mode="json")})
+
+
+def publish_note_deleted(note_id: int):
+    """Broadcast a deleted note id"""
+    publish("deleted", {"id": note_id})
+
+
+def _replay_after(last_event_id: Optional[str]) -> Optional[list]:
+    """Buffered (sequence, message) pairs after an event id, or None if some are gone"""
+    boot, _, sequence = last_event_id.partition("-")
+    if boot != _BOOT or not sequence.isdigit():
+        return None
+    after = int(sequence)
+    with _lock:
+        if after > _sequence or (_replay and after < _replay[0][0] - 1):
+            return None
+        return [(seq, message) for seq, message in _replay if seq > after]
+
+
+async def stream_events(last_event_id: Optional[str], is_disconnected) -> AsyncIterator[str]:
+    """Yield SSE text for one client until it disconnects or falls behind"""
+    client = asyncio.Queue(maxsize=CLIENT_BUFFER_SIZE)
+    # Register before reading the replay buffer so nothing falls in between;
+    # events that show up in both are sent once
+    _clients.add(client)
+    event_metrics["clients"] += 1
+    last_sent = 0
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        if last_event_id:
+            missed = _replay_after(last_event_id)
+            if missed is None:
+                # Too far behind to replay: the client should resync via /notes/changes
+                yield "event: reset\ndata: {}\n\n"
+            else:
+                for last_sent, message in missed:
+                    yield message
+
+        while True:
+            try:
+                message = await asyncio.wait_for(client.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    break
+                yield ": heartbeat\n\n"
+                continue
+            if message is _DISCONNECT:
+                break
+            sequence, message = message
+            if sequence > last_sent:
+                yield message
+    finally:
+        _clients.discard(client)
+        event_metrics["clients"] -= 1
+
+
+def start_event_hub():
+    """Bind the hub to the running event loop"""
+    global _loop
+    _loop = asyncio.get_running_loop()
+
+
+def stop_event_hub():
+    """End every open stream so the server can shut down"""
+    global _loop
+    for client in list(_clients):
+        _clients.discard(client)
+        while not client.empty():
+            client.get_nowait()
+        client.put_nowait(_DISCONNECT)
+    _loop = None
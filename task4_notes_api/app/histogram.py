@@ -0,0 +1,52 @@
+import math
+from typing import Dict, Iterable, Tuple
+
+# Log-linear buckets: 8 linear sub-buckets per power of two, so any recorded
+# value is within 12.5% of its bucket. Microsecond values up to ~12 days fit
+# in under 320 buckets, which bounds memory per route.
+SUB_BUCKET_BITS = 3
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+
+
+def bucket_index(value_us: int) -> int:
+    """Bucket holding a latency in microseconds"""
+    if value_us < SUB_BUCKET_COUNT:
+        return max(value_us, 0)
+    shift = value_us.bit_length() - 1 - SUB_BUCKET_BITS
+    return ((shift + 1) << SUB_BUCKET_BITS) + ((value_us >> shift) & (SUB_BUCKET_COUNT - 1))
+
+
+def bucket_bounds(index: int) -> Tuple[int, int]:
+    """Lowest and highest microsecond value in a bucket"""
+    if index < SUB_BUCKET_COUNT:
+        return index, index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    lower = (SUB_BUCKET_COUNT + (index & (SUB_BUCKET_COUNT - 1))) << shift
+    return lower, lower + (1 << shift) - 1
+
+
+def summarize(buckets: Dict[int, int], percentiles: Iterable[float] = (50, 90, 99)) -> dict:
+    """Count, percentiles, max and approximate sum (in ms) of a bucket histogram"""
+    total = sum(buckets.values())
+    summary = {"count": total}
+    if not total:
+        summary.update({f"p{p:g}_ms": None for p in percentiles})
+        summary.update({"max_ms": None, "sum_ms": 0.0})
+        return summary
+
+    ordered = sorted(buckets.items())
+    for p in percentiles:
+        rank = max(1, math.ceil(p / 100 * total))
+        seen = 0
+        for index, count in ordered:
+            seen += count
+            if seen >= rank:
+                lower, upper = bucket_bounds(index)
+                summary[f"p{p:g}_ms"] = round((lower + upper) / 2 / 1000, 3)
+                break
+
+    summary["max_ms"] = round(bucket_bounds(ordered[-1][0])[1] / 1000, 3)
+    summary["sum_ms"] = round(sum(
+        (sum(bucket_bounds(index)) / 2) * count for index, count in ordered
+    ) / 1000, 3)
+    return summary
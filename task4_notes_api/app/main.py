@@ -1,13 +1,17 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-import json
-import os
+from fastapi.responses import PlainTextResponse
 from datetime import datetime
+import time
 from .database import create_db_and_tables
 from .routers import notes
-
-# Global request counter
-request_count = 0
+from .backup import restore_if_empty, start_backup_worker, stop_backup_worker, BACKUP_FILE, CHANGE_LOG_FILE
+from .request_log import log_request, start_request_log, stop_request_log, log_metrics, REQUEST_LOG_FILE
+from .events import start_event_hub, stop_event_hub, event_metrics
+from .metrics import (
+    record_request, route_label, get_request_total, get_request_breakdown, render_prometheus,
+    start_metrics, stop_metrics
+)
 
 app = FastAPI(
     title="Notes API",
@@ -31,34 +35,23 @@ app.add_middleware(
 @app.middleware("http")
 async def count_and_log_requests(request: Request, call_next):
     """Middleware to count total requests made and log them"""
-    global request_count
-    request_count += 1
-
-    # Log request details
-    log_data = {
-        "request_number": request_count,
+    # Log request details; written to file in the background
+    log_request({
+        "request_number": get_request_total() + 1,
         "timestamp": datetime.utcnow().isoformat(),
         "method": request.method,
         "url": str(request.url),
         "client_ip": request.client.host,
         "user_agent": request.headers.get("user-agent", "Unknown")
-    }
-
-    # Save log to file
-    log_file = "request_logs.json"
-    if os.path.exists(log_file):
-        with open(log_file, "r") as f:
-            logs = json.load(f)
-    else:
-        logs = []
-
-    logs.append(log_data)
-
-    with open(log_file, "w") as f:
-        json.dump(logs, f, indent=2)
+    })
 
+    started = time.perf_counter()
     response = await call_next(request)
-    response.headers["X-Request-Count"] = str(request_count)
+    duration = time.perf_counter() - started
+
+    # Counted per route and status; shared across workers via SQLite
+    record_request(route_label(request), request.method, response.status_code, duration)
+    response.headers["X-Request-Count"] = str(get_request_total())
     return response
 
 
@@ -66,6 +59,31 @@ async def count_and_log_requests(request: Request, call_next):
 def on_startup():
     """Initialize database"""
     create_db_and_tables()
+    # Disaster recovery: refill an empty database from notes.json when asked to
+    restore_if_empty()
+    start_backup_worker()
+
+
+@app.on_event("startup")
+async def start_request_logging():
+    """Start the background request log writer, counter flusher and event hub"""
+    start_event_hub()
+    start_request_log()
+    await start_metrics()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """Flush pending backups"""
+    stop_backup_worker()
+
+
+@app.on_event("shutdown")
+async def stop_request_logging():
+    """Close event streams, flush queued request log entries and counters"""
+    stop_event_hub()
+    await stop_request_log()
+    await stop_metrics()
 
 
 # Include routers
@@ -78,7 +96,7 @@ def root():
     return {
         "message": "Welcome to Notes API",
         "docs": "/docs",
-        "total_requests": request_count,
+        "total_requests": get_request_total(),
         "features": [
             "Create, read, update, delete notes",
             "Automatic JSON backup",
@@ -94,17 +112,26 @@ def health_check():
     return {
         "status": "healthy",
         "service": "notes-api",
-        "total_requests": request_count,
+        "total_requests": get_request_total(),
         "timestamp": datetime.utcnow()
     }
 
 
 @app.get("/stats")
-def get_request_stats():
-    """Get request statistics"""
+def get_request_stats(
+    format: str = Query("json", pattern="^(json|prometheus)$", description="json or prometheus text format")
+):
+    """Get request statistics with per-route latency percentiles"""
+    if format == "prometheus":
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
     return {
-        "total_requests": request_count,
+        "total_requests": get_request_total(),
+        **get_request_breakdown(),
         "timestamp": datetime.utcnow(),
-        "log_file": "request_logs.json",
-        "backup_file": "notes.json"
+        "log_file": REQUEST_LOG_FILE,
+        "request_log": log_metrics,
+        "event_stream": event_metrics,
+        "backup_file": BACKUP_FILE,
+        "backup_change_log": CHANGE_LOG_FILE
     }
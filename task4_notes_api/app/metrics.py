@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from .database import engine
+from .histogram import bucket_index, summarize
+from .models import LatencyBucket, RequestCounter, RequestWindow
+
+FLUSH_INTERVAL_SECONDS = 1.0
+SLIDING_WINDOWS = {"1m": 60, "5m": 300, "15m": 900}
+WINDOW_RETENTION_SECONDS = max(SLIDING_WINDOWS.values())
+
+logger = logging.getLogger(__name__)
+
+# Counts recorded by this process since the last flush, keyed by (route, method, status)
+_pending: Counter = Counter()
+# Latency bucket counts keyed by (route, method, bucket)
+_pending_latency: Counter = Counter()
+# Requests and 5xx errors keyed by unix second
+_pending_windows: Counter = Counter()
+_pending_errors: Counter = Counter()
+_in_flight_total = 0
+# Total across all worker processes as of the last flush
+_shared_total = 0
+_flush_task: Optional[asyncio.Task] = None
+
+
+def route_label(request) -> str:
+    """Route template of a handled request, e.g. /notes/{note_id}"""
+    route = request.scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+def record_request(route: str, method: str, status_code: int, duration_seconds: float):
+    """Count a finished request locally; flushed to SQLite in batches"""
+    _pending[(route, method, status_code)] += 1
+    _pending_latency[(route, method, bucket_index(int(duration_seconds * 1_000_000)))] += 1
+    second = int(time.time())
+    _pending_windows[second] += 1
+    if status_code >= 500:
+        _pending_errors[second] += 1
+
+
+def get_request_total() -> int:
+    """Requests served by all workers, including this worker's unflushed ones"""
+    return _shared_total + _in_flight_total + sum(_pending.values())
+
+
+def _upsert_total(session: Session, model, keys: dict, total: int):
+    """Add total to the row identified by keys, creating it if needed"""
+    stmt = sqlite_insert(model).values(**keys, total=total)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={"total": model.total + stmt.excluded.total}
+    )
+    session.execute(stmt)
+
+
+def _write_counts(batch: Counter, latency: Counter, windows: Counter, errors: Counter) -> int:
+    """Add a batch of counts to the shared rows; return the new grand total"""
+    with Session(engine) as session:
+        for (route, method, status_code), total in batch.items():
+            _upsert_total(session, RequestCounter, {"route": route, "method": method, "status_code": status_code}, total)
+        for (route, method, bucket), total in latency.items():
+            _upsert_total(session, LatencyBucket, {"route": route, "method": method, "bucket": bucket}, total)
+        for second, requests in windows.items():
+            stmt = sqlite_insert(RequestWindow).values(second=second, requests=requests, errors=errors[second])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["second"],
+                set_={
+                    "requests": RequestWindow.requests + stmt.excluded.requests,
+                    "errors": RequestWindow.errors + stmt.excluded.errors
+                }
+            )
+            session.execute(stmt)
+        session.exec(delete(RequestWindow).where(RequestWindow.second < int(time.time()) - WINDOW_RETENTION_SECONDS))
+        session.commit()
+        return session.exec(select(func.coalesce(func.sum(RequestCounter.total), 0))).one()
+
+
+async def flush_counters():
+    """Move this worker's pending counts into the shared tables"""
+    global _pending, _pending_latency, _pending_windows, _pending_errors, _in_flight_total, _shared_total
+    batch, _pending = _pending, Counter()
+    latency, _pending_latency = _pending_latency, Counter()
+    windows, _pending_windows = _pending_windows, Counter()
+    errors, _pending_errors = _pending_errors, Counter()
+    _in_flight_total = sum(batch.values())
+    try:
+        # Runs even for an empty batch so other workers' requests show up
+        _shared_total = await asyncio.to_thread(_write_counts, batch, latency, windows, errors)
+    except Exception:
+        logger.exception("Flushing request metrics failed")
+        _pending.update(batch)
+        _pending_latency.update(latency)
+        _pending_windows.update(windows)
+        _pending_errors.update(errors)
+    finally:
+        _in_flight_total = 0
+
+
+def _load_counts(session: Session):
+    """Shared counter and latency rows merged with this worker's unflushed counts"""
+    counts = Counter(dict(_pending))
+    for row in session.exec(select(RequestCounter)).all():
+        counts[(row.route, row.method, row.status_code)] += row.total
+
+    latency = defaultdict(Counter)
+    for (route, method, bucket), total in dict(_pending_latency).items():
+        latency[(route, method)][bucket] += total
+    for row in session.exec(select(LatencyBucket)).all():
+        latency[(row.route, row.method)][row.bucket] += row.total
+    return counts, latency
+
+
+def _window_rates(session: Session) -> dict:
+    """Throughput and server error rate over each sliding window"""
+    now = int(time.time())
+    windows = Counter(dict(_pending_windows))
+    errors = Counter(dict(_pending_errors))
+    rows = session.exec(
+        select(RequestWindow).where(RequestWindow.second > now - WINDOW_RETENTION_SECONDS)
+    ).all()
+    for row in rows:
+        windows[row.second] += row.requests
+        errors[row.second] += row.errors
+
+    rates = {}
+    for name, seconds in SLIDING_WINDOWS.items():
+        requests = sum(total for second, total in windows.items() if second > now - seconds)
+        failed = sum(total for second, total in errors.items() if second > now - seconds)
+        rates[name] = {
+            "requests": requests,
+            "requests_per_second": round(requests / seconds, 3),
+            "error_rate": round(failed / requests, 4) if requests else 0.0
+        }
+    return rates
+
+
+def get_request_breakdown() -> dict:
+    """Request totals, latency percentiles and error rates across all workers"""
+    with Session(engine) as session:
+        counts, latency = _load_counts(session)
+        windows = _window_rates(session)
+
+    by_status = Counter()
+    route_totals = Counter()
+    route_errors = Counter()
+    for (route, method, status_code), total in counts.items():
+        by_status[str(status_code)] += total
+        route_totals[(route, method)] += total
+        if status_code >= 500:
+            route_errors[(route, method)] += total
+
+    by_route = {}
+    for (route, method), total in route_totals.most_common():
+        summary = summarize(latency[(route, method)])
+        by_route[f"{method} {route}"] = {
+            "requests": total,
+            "error_rate": round(route_errors[(route, method)] / total, 4),
+            "p50_ms": summary["p50_ms"],
+            "p90_ms": summary["p90_ms"],
+            "p99_ms": summary["p99_ms"],
+            "max_ms": summary["max_ms"]
+        }
+    return {
+        "by_route": by_route,
+        "by_status": dict(sorted(by_status.items())),
+        "windows": windows,
+    }
+
+
+def _label(value: str) -> str:
+    """Escape a Prometheus label value"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus() -> str:
+    """Request metrics in the Prometheus text exposition format"""
+    with Session(engine) as session:
+        counts, latency = _load_counts(session)
+        windows = _window_rates(session)
+
+    lines = [
+        "# HELP notes_requests_total Requests served, by route, method and status.",
+        "# TYPE notes_requests_total counter",
+    ]
+    for (route, method, status_code), total in sorted(counts.items()):
+        lines.append(
+            f'notes_requests_total{{route="{_label(route)}",method="{method}",status="{status_code}"}} {total}'
+        )
+
+    lines += [
+        "# HELP notes_request_duration_seconds Request latency from log-bucket histograms (within 12.5%).",
+        "# TYPE notes_request_duration_seconds summary",
+    ]
+    for (route, method), buckets in sorted(latency.items()):
+        labels = f'route="{_label(route)}",method="{method}"'
+        summary = summarize(buckets)
+        for quantile, key in (("0.5", "p50_ms"), ("0.9", "p90_ms"), ("0.99", "p99_ms")):
+            lines.append(f'notes_request_duration_seconds{{{labels},quantile="{quantile}"}} {summary[key] / 1000}')
+        lines.append(f"notes_request_duration_seconds_sum{{{labels}}} {summary['sum_ms'] / 1000}")
+        lines.append(f"notes_request_duration_seconds_count{{{labels}}} {summary['count']}")
+
+    lines += [
+        "# HELP notes_requests_per_second Request throughput over a sliding window.",
+        "# TYPE notes_requests_per_second gauge",
+    ]
+    for name, rates in windows.items():
+        lines.append(f'notes_requests_per_second{{window="{name}"}} {rates["requests_per_second"]}')
+    lines += [
+        "# HELP notes_error_ratio Share of 5xx responses over a sliding window.",
+        "# TYPE notes_error_ratio gauge",
+    ]
+    for name, rates in windows.items():
+        lines.append(f'notes_error_ratio{{window="{name}"}} {rates["error_rate"]}')
+    return "\n".join(lines) + "\n"
+
+
+async def _run_flusher():
+    """Flush counters every FLUSH_INTERVAL_SECONDS"""
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+        await flush_counters()
+
+
+async def start_metrics():
+    """Load the shared total and start the periodic flush task"""
+    global _flush_task
+    await flush_counters()
+    _flush_task = asyncio.get_running_loop().create_task(_run_flusher())
+
+
+async def stop_metrics():
+    """Stop the flush task and write what is still pending"""
+    if _flush_task:
+        _flush_task.cancel()
+    await flush_counters()
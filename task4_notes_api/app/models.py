@@ -1,6 +1,9 @@
-from typing import Optional
+from typing import List, Optional
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, UniqueConstraint
+from .compression import CompressedText
 from datetime import datetime
+from enum import Enum
 from pydantic import BaseModel
 
 
@@ -11,8 +14,11 @@ class NoteBase(SQLModel):
 
 class Note(NoteBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
+    content: str = Field(sa_column=Column(CompressedText, nullable=False))
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    # Assigned by a database trigger on every write, in commit order (see database.py)
+    change_seq: Optional[int] = Field(default=None, index=True)
 
 
 class NoteCreate(NoteBase):
@@ -30,6 +36,135 @@ class NoteRead(NoteBase):
     updated_at: datetime
 
 
+class NoteTombstone(SQLModel, table=True):
+    """Deletion log entry, so sync clients learn which notes went away"""
+    # Never reuse ids: they are the deletion part of a sync token
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    note_id: int
+    deleted_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class NoteChangeCounter(SQLModel, table=True):
+    """Single-row counter that numbers note writes for delta sync"""
+    id: int = Field(default=1, primary_key=True)
+    value: int = 0
+
+
+class NoteChanges(SQLModel):
+    notes: List[NoteRead]
+    deleted: List[int]
+    next_token: str
+    has_more: bool
+
+
+class NoteBatchOp(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+class NoteBatchOperation(SQLModel):
+    op: NoteBatchOp
+    id: Optional[int] = None
+    title: Optional[str] = None
+    content: Optional[str] = None
+    if_match: Optional[str] = None
+
+
+class NoteBatchRequest(SQLModel):
+    operations: List[NoteBatchOperation] = Field(max_length=1000)
+    atomic: bool = False
+
+
+class NoteBatchResult(SQLModel):
+    index: int
+    op: NoteBatchOp
+    status: int
+    id: Optional[int] = None
+    note: Optional[NoteRead] = None
+    error: Optional[str] = None
+
+
+class NoteBatchResponse(SQLModel):
+    committed: bool
+    results: List[NoteBatchResult]
+
+
+class NoteRevision(SQLModel, table=True):
+    """Stored note version: a full keyframe or a compressed diff from the previous revision"""
+    __table_args__ = (
+        UniqueConstraint("note_id", "revision", name="uq_noterevision_note_revision"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    note_id: int = Field(index=True)
+    revision: int
+    title: str
+    is_keyframe: bool
+    data: bytes
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class NoteRevisionInfo(SQLModel):
+    revision: int
+    title: str
+    is_keyframe: bool
+    stored_bytes: int
+    created_at: datetime
+
+
+class NoteRevisionRead(SQLModel):
+    note_id: int
+    revision: int
+    title: str
+    content: str
+    created_at: datetime
+
+
+class NoteSearchHit(SQLModel):
+    id: int
+    title: str
+    snippet: str
+    score: float
+    created_at: datetime
+    updated_at: datetime
+
+
 class RequestCountModel(BaseModel):
     total_requests: int
     last_updated: datetime
+
+
+class RequestCounter(SQLModel, table=True):
+    """Request count per route, method and status, shared by all workers"""
+    __table_args__ = (
+        UniqueConstraint("route", "method", "status_code", name="uq_requestcounter_route_method_status"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    route: str
+    method: str
+    status_code: int
+    total: int = Field(default=0)
+
+
+class LatencyBucket(SQLModel, table=True):
+    """Latency histogram bucket per route and method, shared by all workers"""
+    __table_args__ = (
+        UniqueConstraint("route", "method", "bucket", name="uq_latencybucket_route_method_bucket"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    route: str
+    method: str
+    bucket: int
+    total: int = Field(default=0)
+
+
+class RequestWindow(SQLModel, table=True):
+    """Requests and server errors per second, kept for the sliding windows"""
+    second: int = Field(primary_key=True)
+    requests: int = Field(default=0)
+    errors: int = Field(default=0)
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+REQUEST_LOG_FILE = "request_logs.jsonl"
+
+QUEUE_MAX_SIZE = 10000
+SAMPLE_THRESHOLD = 0.8         # above this queue fill ratio only 1 in SAMPLE_RATE entries is kept
+SAMPLE_RATE = 10
+BATCH_SIZE = 500
+ROTATE_MAX_BYTES = 10 * 1024 * 1024
+ROTATE_MAX_AGE_SECONDS = 24 * 60 * 60
+ROTATE_BACKUP_COUNT = 5
+
+logger = logging.getLogger(__name__)
+
+log_metrics = {
+    "written": 0,
+    "dropped": 0,
+    "sampled_out": 0,
+    "rotations": 0,
+}
+
+_queue: Optional[asyncio.Queue] = None
+_writer_task: Optional[asyncio.Task] = None
+_sample_counter = 0
+_file_opened_at: Optional[float] = None  # read from the file on first write, so restarts keep its age
+
+
+def log_request(entry: dict):
+    """Queue a request log entry without blocking the request"""
+    global _sample_counter
+    if _queue is None:
+        return
+
+    # Backpressure: sample when the writer falls behind, drop when full
+    if _queue.qsize() >= QUEUE_MAX_SIZE * SAMPLE_THRESHOLD:
+        _sample_counter += 1
+        if _sample_counter % SAMPLE_RATE:
+            log_metrics["sampled_out"] += 1
+            return
+    try:
+        _queue.put_nowait(entry)
+    except asyncio.QueueFull:
+        log_metrics["dropped"] += 1
+
+
+def _rotate():
+    """Shift request_logs.jsonl -> .1 -> .2 ... keeping ROTATE_BACKUP_COUNT files"""
+    global _file_opened_at
+    for index in range(ROTATE_BACKUP_COUNT - 1, 0, -1):
+        source = f"{REQUEST_LOG_FILE}.{index}"
+        if os.path.exists(source):
+            os.replace(source, f"{REQUEST_LOG_FILE}.{index + 1}")
+    if os.path.exists(REQUEST_LOG_FILE):
+        os.replace(REQUEST_LOG_FILE, f"{REQUEST_LOG_FILE}.1")
+    _file_opened_at = time.time()
+    log_metrics["rotations"] += 1
+
+
+def _file_started_at() -> float:
+    """When the existing log file was started: its first entry's timestamp, else its mtime"""
+    try:
+        with open(REQUEST_LOG_FILE) as f:
+            first = json.loads(f.readline())
+        return datetime.fromisoformat(first["timestamp"]).replace(tzinfo=timezone.utc).timestamp()
+    except (ValueError, KeyError, TypeError):
+        return os.path.getmtime(REQUEST_LOG_FILE)
+
+
+def _write_batch(entries: list):
+    """Append a batch of entries as JSON lines, rotating by size or age first"""
+    global _file_opened_at
+    if not os.path.exists(REQUEST_LOG_FILE):
+        _file_opened_at = time.time()
+    else:
+        if _file_opened_at is None:
+            _file_opened_at = _file_started_at()
+        too_big = os.path.getsize(REQUEST_LOG_FILE) >= ROTATE_MAX_BYTES
+        too_old = time.time() - _file_opened_at >= ROTATE_MAX_AGE_SECONDS
+        if too_big or too_old:
+            _rotate()
+
+    with open(REQUEST_LOG_FILE, "a") as f:
+        f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+    log_metrics["written"] += len(entries)
+
+
+async def _run_writer():
+    """Write queued entries in batches off the event loop"""
+    while True:
+        entries = [await _queue.get()]
+        while len(entries) < BATCH_SIZE and not _queue.empty():
+            entries.append(_queue.get_nowait())
+        try:
+            await asyncio.to_thread(_write_batch, entries)
+        except Exception:
+            logger.exception("Writing request log failed")
+        for _ in entries:
+            _queue.task_done()
+
+
+def start_request_log():
+    """Create the queue and start the writer task on the running loop"""
+    global _queue, _writer_task
+    _queue = asyncio.Queue(maxsize=QUEUE_MAX_SIZE)
+    _writer_task = asyncio.get_running_loop().create_task(_run_writer())
+
+
+async def stop_request_log():
+    """Flush queued entries and stop the writer task"""
+    global _queue
+    if _queue is None:
+        return
+    await _queue.join()
+    _writer_task.cancel()
+    _queue = None
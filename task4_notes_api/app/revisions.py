@@ -0,0 +1,154 @@
+import difflib
+import json
+import zlib
+from typing import List, Optional
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+from .models import Note, NoteRevision, NoteRevisionInfo, NoteRevisionRead
+
+KEYFRAME_INTERVAL = 20  # every Nth revision stores the full content
+MAX_REVISIONS = 100     # revisions kept per note (plus those needed to rebuild them)
+
+
+def _diff(old: str, new: str) -> list:
+    """Line-based edit script turning old into new"""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i2 - i1])
+            continue
+        if tag in ("delete", "replace"):
+            ops.append(["-", i2 - i1])
+        if tag in ("insert", "replace"):
+            ops.append(["+", new_lines[j1:j2]])
+    return ops
+
+
+def _patch(old: str, ops: list) -> str:
+    """Apply an edit script produced by _diff"""
+    old_lines = old.splitlines(keepends=True)
+    position = 0
+    result = []
+    for op, value in ops:
+        if op == "=":
+            result.extend(old_lines[position:position + value])
+            position += value
+        elif op == "-":
+            position += value
+        else:
+            result.extend(value)
+    return "".join(result)
+
+
+def _latest_revision(session: Session, note_id: int) -> Optional[int]:
+    """Highest revision number stored for a note"""
+    return session.exec(
+        select(func.max(NoteRevision.revision)).where(NoteRevision.note_id == note_id)
+    ).one()
+
+
+def _add_revision(session: Session, note_id: int, revision: int, title: str, content: str, previous: Optional[str]):
+    """Store a revision as a delta, or as a keyframe when due or smaller"""
+    keyframe = zlib.compress(content.encode())
+    data, is_keyframe = keyframe, True
+    if previous is not None and (revision - 1) % KEYFRAME_INTERVAL:
+        delta = zlib.compress(json.dumps(_diff(previous, content)).encode())
+        if len(delta) < len(keyframe):
+            data, is_keyframe = delta, False
+    session.add(NoteRevision(
+        note_id=note_id, revision=revision, title=title, is_keyframe=is_keyframe, data=data
+    ))
+
+
+def _prune(session: Session, note_id: int, latest: int):
+    """Drop revisions older than the retention window, keeping the keyframe its first kept revision builds on"""
+    oldest_kept = latest - MAX_REVISIONS + 1
+    if oldest_kept <= 1:
+        return
+    base = session.exec(
+        select(func.max(NoteRevision.revision)).where(
+            NoteRevision.note_id == note_id,
+            NoteRevision.is_keyframe == True,  # noqa: E712
+            NoteRevision.revision <= oldest_kept
+        )
+    ).one()
+    if base:
+        session.exec(delete(NoteRevision).where(
+            NoteRevision.note_id == note_id, NoteRevision.revision < base
+        ))
+
+
+def ensure_base_revision(session: Session, note: Note):
+    """Save the current version of a note that predates revision history"""
+    if _latest_revision(session, note.id) is None:
+        _add_revision(session, note.id, 1, note.title, note.content, None)
+
+
+def record_revision(session: Session, note: Note, previous_content: Optional[str]):
+    """Append the note's current version to its history"""
+    latest = _latest_revision(session, note.id) or 0
+    _add_revision(session, note.id, latest + 1, note.title, note.content, previous_content)
+    _prune(session, note.id, latest + 1)
+
+
+def delete_revisions(session: Session, note_id: int):
+    """Remove the whole history of a note"""
+    session.exec(delete(NoteRevision).where(NoteRevision.note_id == note_id))
+
+
+def list_revisions(session: Session, note_id: int) -> List[NoteRevisionInfo]:
+    """Revision metadata of a note, newest first"""
+    rows = session.exec(
+        select(
+            NoteRevision.revision, NoteRevision.title, NoteRevision.is_keyframe,
+            func.length(NoteRevision.data), NoteRevision.created_at
+        )
+        .where(NoteRevision.note_id == note_id)
+        .order_by(NoteRevision.revision.desc())
+    ).all()
+    return [
+        NoteRevisionInfo(revision=revision, title=title, is_keyframe=is_keyframe, stored_bytes=size, created_at=created_at)
+        for revision, title, is_keyframe, size, created_at in rows
+    ]
+
+
+def materialize_revision(session: Session, note_id: int, revision: int) -> Optional[NoteRevisionRead]:
+    """Rebuild a revision from the nearest keyframe and the deltas after it"""
+    base = session.exec(
+        select(func.max(NoteRevision.revision)).where(
+            NoteRevision.note_id == note_id,
+            NoteRevision.is_keyframe == True,  # noqa: E712
+            NoteRevision.revision <= revision
+        )
+    ).one()
+    if base is None:
+        return None
+
+    chain = session.exec(
+        select(NoteRevision)
+        .where(
+            NoteRevision.note_id == note_id,
+            NoteRevision.revision >= base,
+            NoteRevision.revision <= revision
+        )
+        .order_by(NoteRevision.revision)
+    ).all()
+    if not chain or chain[-1].revision != revision:
+        return None
+
+    content = ""
+    for stored in chain:
+        payload = zlib.decompress(stored.data).decode()
+        content = payload if stored.is_keyframe else _patch(content, json.loads(payload))
+
+    target = chain[-1]
+    return NoteRevisionRead(
+        note_id=note_id,
+        revision=target.revision,
+        title=target.title,
+        content=content,
+        created_at=target.created_at
+    )
@@ -1,71 +1,173 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Header, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import OperationalError
 from sqlmodel import Session, select
-from typing import List
-import json
-import os
+from typing import List, Optional
 from datetime import datetime
-from ..models import Note, NoteCreate, NoteUpdate, NoteRead
+from ..models import (
+    Note, NoteCreate, NoteUpdate, NoteRead, NoteSearchHit, NoteRevisionInfo, NoteRevisionRead, NoteChanges,
+    NoteBatchOp, NoteBatchRequest, NoteBatchResponse
+)
 from ..database import get_session
+from ..backup import enqueue_note_saved, enqueue_note_deleted, enqueue_notes_changed
+from ..batch import apply_batch
+from ..events import stream_events, publish_note_saved, publish_note_deleted
+from ..search import search_notes
+from ..sync import get_changes, record_tombstone, SyncTokenExpired
+from ..etags import note_etag, collection_etag, http_date, is_not_modified, not_modified, check_if_match
+from ..revisions import (
+    ensure_base_revision, record_revision, delete_revisions, list_revisions, materialize_revision
+)
 
 router = APIRouter(prefix="/notes", tags=["notes"])
 
 
-def backup_notes_to_json(session: Session):
-    """Save all notes to notes.json for backup"""
-    notes = session.exec(select(Note)).all()
-    notes_data = []
-
-    for note in notes:
-        note_dict = {
-            "id": note.id,
-            "title": note.title,
-            "content": note.content,
-            "created_at": note.created_at.isoformat(),
-            "updated_at": note.updated_at.isoformat()
-        }
-        notes_data.append(note_dict)
-
-    with open("notes.json", "w") as f:
-        json.dump(notes_data, f, indent=2)
-
-
 @router.post("/", response_model=NoteRead)
 def create_note(
     note: NoteCreate,
+    response: Response,
     session: Session = Depends(get_session)
 ):
     """Create a new note"""
     db_note = Note(**note.dict())
     session.add(db_note)
+    session.flush()
+    record_revision(session, db_note, None)
     session.commit()
     session.refresh(db_note)
 
-    # Backup to JSON
-    backup_notes_to_json(session)
+    # Queue for the background JSON backup
+    enqueue_note_saved(db_note)
+    publish_note_saved(NoteRead.model_validate(db_note), created=True)
 
+    response.headers["ETag"] = note_etag(db_note.id, db_note.updated_at)
     return db_note
 
 
+@router.post("/batch", response_model=NoteBatchResponse)
+def batch_notes(
+    batch: NoteBatchRequest,
+    response: Response,
+    session: Session = Depends(get_session)
+):
+    """Apply many create/update/delete operations in one transaction"""
+    results, saved, deleted = apply_batch(session, batch.operations)
+
+    if batch.atomic and any(result.status >= 400 for result in results):
+        session.rollback()
+        response.status_code = status.HTTP_409_CONFLICT
+        return NoteBatchResponse(committed=False, results=results)
+
+    # Capture final versions before commit expires them
+    session.flush()
+    notes = {note.id: NoteRead.model_validate(note) for note in saved}
+    session.commit()
+
+    # One backup item for the whole batch
+    enqueue_notes_changed(list(notes.values()), deleted)
+
+    created_ids = set()
+    for result in results:
+        if result.op != NoteBatchOp.DELETE and result.id in notes:
+            result.note = notes[result.id]
+            if result.op == NoteBatchOp.CREATE:
+                created_ids.add(result.id)
+    for note in notes.values():
+        publish_note_saved(note, created=note.id in created_ids)
+    for note_id in deleted:
+        publish_note_deleted(note_id)
+    return NoteBatchResponse(committed=True, results=results)
+
+
 @router.get("/", response_model=List[NoteRead])
 def get_notes(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    if_none_match: Optional[str] = Header(None),
     session: Session = Depends(get_session)
 ):
     """Get all notes"""
+    # Answer unchanged pages before loading any note bodies
+    etag = collection_etag(session, skip, limit)
+    if is_not_modified(if_none_match, None, etag):
+        return not_modified(etag)
+
     notes = session.exec(select(Note).offset(skip).limit(limit)).all()
+    response.headers["ETag"] = etag
     return notes
 
 
+@router.get("/search", response_model=List[NoteSearchHit])
+def search(
+    response: Response,
+    q: str = Query(..., min_length=1, description="Words to search for in titles and content"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    session: Session = Depends(get_session)
+):
+    """Full-text search over notes, best matches first"""
+    try:
+        hits, next_cursor = search_notes(session, q, limit, cursor)
+    except (ValueError, OperationalError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search: {str(e)}")
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return hits
+
+
+@router.get("/stream")
+async def stream_note_events(
+    request: Request,
+    last_event_id: Optional[str] = Header(None)
+):
+    """Server-sent events for note creates, updates and deletes"""
+    return StreamingResponse(
+        stream_events(last_event_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/changes", response_model=NoteChanges)
+def get_note_changes(
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    session: Session = Depends(get_session)
+):
+    """Notes changed and deleted since a sync token; omit `since` for a full sync"""
+    try:
+        return get_changes(session, since, limit)
+    except SyncTokenExpired:
+        raise HTTPException(status_code=410, detail="Sync token expired, start a full sync")
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+
 @router.get("/{note_id}", response_model=NoteRead)
 def get_note(
     note_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
     session: Session = Depends(get_session)
 ):
     """Get a specific note by ID"""
+    # Check the validators without reading (and decompressing) the body
+    updated_at = session.exec(select(Note.updated_at).where(Note.id == note_id)).first()
+    if updated_at is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    etag = note_etag(note_id, updated_at)
+    if is_not_modified(if_none_match, if_modified_since, etag, updated_at):
+        return not_modified(etag, updated_at)
+
     note = session.get(Note, note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
+    response.headers["ETag"] = note_etag(note.id, note.updated_at)
+    response.headers["Last-Modified"] = http_date(note.updated_at)
     return note
 
 
@@ -73,17 +175,26 @@ def get_note(
 def update_note(
     note_id: int,
     note_update: NoteUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     session: Session = Depends(get_session)
 ):
     """Update a note"""
     note = session.get(Note, note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
+    check_if_match(if_match, note_etag(note.id, note.updated_at))
+
+    ensure_base_revision(session, note)
+    previous_title, previous_content = note.title, note.content
 
     note_data = note_update.dict(exclude_unset=True)
     for field, value in note_data.items():
         setattr(note, field, value)
 
+    if (note.title, note.content) != (previous_title, previous_content):
+        record_revision(session, note, previous_content)
+
     # Update the updated_at timestamp
     note.updated_at = datetime.utcnow()
 
@@ -91,26 +202,60 @@ def update_note(
     session.commit()
     session.refresh(note)
 
-    # Backup to JSON
-    backup_notes_to_json(session)
+    # Queue for the background JSON backup
+    enqueue_note_saved(note)
+    publish_note_saved(NoteRead.model_validate(note))
 
+    response.headers["ETag"] = note_etag(note.id, note.updated_at)
     return note
 
 
 @router.delete("/{note_id}")
 def delete_note(
     note_id: int,
+    if_match: Optional[str] = Header(None),
     session: Session = Depends(get_session)
 ):
     """Delete a note"""
     note = session.get(Note, note_id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
+    check_if_match(if_match, note_etag(note.id, note.updated_at))
 
     session.delete(note)
+    delete_revisions(session, note_id)
+    record_tombstone(session, note_id)
     session.commit()
 
-    # Backup to JSON after deletion
-    backup_notes_to_json(session)
+    # Queue the deletion for the background JSON backup
+    enqueue_note_deleted(note_id)
+    publish_note_deleted(note_id)
 
     return {"message": "Note deleted successfully"}
+
+
+@router.get("/{note_id}/revisions", response_model=List[NoteRevisionInfo])
+def get_note_revisions(
+    note_id: int,
+    session: Session = Depends(get_session)
+):
+    """List the stored revisions of a note, newest first"""
+    if not session.get(Note, note_id):
+        raise HTTPException(status_code=404, detail="Note not found")
+    return list_revisions(session, note_id)
+
+
+@router.get("/{note_id}/revisions/{revision}", response_model=NoteRevisionRead)
+def get_note_revision(
+    note_id: int,
+    revision: int,
+    session: Session = Depends(get_session)
+):
+    """Get a note as it was at a given revision"""
+    if not session.get(Note, note_id):
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    note_revision = materialize_revision(session, note_id, revision)
+    if not note_revision:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return note_revision
@@ -0,0 +1,87 @@
+import base64
+import json
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlmodel import Session
+from .models import NoteSearchHit
+
+# Title matches weigh more than body matches in the BM25 score
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+SNIPPET_TOKENS = 16
+
+# bm25() is lower for better matches, so results ascend by (score, id)
+_SEARCH_SQL = text(f"""
+    SELECT
+        n.id,
+        highlight(note_fts, 0, '<mark>', '</mark>') AS title,
+        snippet(note_fts, 1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) AS snippet,
+        bm25(note_fts, {TITLE_WEIGHT}, {CONTENT_WEIGHT}) AS score,
+        n.created_at,
+        n.updated_at
+    FROM note_fts
+    JOIN note n ON n.id = note_fts.rowid
+    WHERE note_fts MATCH :query
+      AND (:after_score IS NULL
+           OR bm25(note_fts, {TITLE_WEIGHT}, {CONTENT_WEIGHT}) > :after_score
+           OR (bm25(note_fts, {TITLE_WEIGHT}, {CONTENT_WEIGHT}) = :after_score AND n.id > :after_id))
+    ORDER BY score, n.id
+    LIMIT :limit
+""")
+
+
+def build_match_query(q: str) -> str:
+    """Turn free text into an FTS5 query: all words required, last one as a prefix"""
+    words = re.findall(r"\w+", q)
+    if not words:
+        raise ValueError("Search query must contain at least one word")
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def encode_cursor(score: float, note_id: int) -> str:
+    """Opaque cursor pointing after a search hit"""
+    return base64.urlsafe_b64encode(json.dumps([score, note_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Inverse of encode_cursor"""
+    payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if (
+        not isinstance(payload, list) or len(payload) != 2
+        or isinstance(payload[0], bool) or not isinstance(payload[0], (int, float))
+        or isinstance(payload[1], bool) or not isinstance(payload[1], int)
+    ):
+        raise ValueError("malformed cursor")
+    score, note_id = payload
+    return float(score), note_id
+
+
+def search_notes(session: Session, q: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[NoteSearchHit], Optional[str]]:
+    """Ranked search hits for q and the cursor of the next page, if any"""
+    after_score, after_id = decode_cursor(cursor) if cursor else (None, None)
+    rows = session.execute(_SEARCH_SQL, {
+        "query": build_match_query(q),
+        "after_score": after_score,
+        "after_id": after_id,
+        "limit": limit + 1
+    }).mappings().all()
+
+    hits = [
+        NoteSearchHit(
+            id=row["id"],
+            title=row["title"],
+            snippet=row["snippet"],
+            score=row["score"],
+            created_at=datetime.fromisoformat(row["created_at"]),
+            updated_at=datetime.fromisoformat(row["updated_at"])
+        )
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(hits[-1].score, hits[-1].id)
+    return hits, next_cursor
@@ -0,0 +1,81 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from sqlalchemy import exists, func
+from sqlmodel import Session, select
+from .models import Note, NoteTombstone, NoteChanges
+
+# Tombstones older than this are pruned; tokens that still need them expire
+TOMBSTONE_RETENTION_DAYS = 30
+
+
+class SyncTokenExpired(Exception):
+    """The deletions a token needs have already been pruned"""
+
+
+def encode_token(change_seq: int, tombstone_id: int) -> str:
+    """Opaque sync token: last note change_seq seen and last tombstone id"""
+    return base64.urlsafe_b64encode(json.dumps([change_seq, tombstone_id]).encode()).decode()
+
+
+def decode_token(token: str) -> Tuple[int, int]:
+    """Inverse of encode_token"""
+    payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+    if isinstance(payload, list) and len(payload) == 3:
+        # Issued before tokens used change_seq
+        raise SyncTokenExpired()
+    change_seq, tombstone_id = payload
+    return int(change_seq), int(tombstone_id)
+
+
+def record_tombstone(session: Session, note_id: int):
+    """Log a note deletion and prune tombstones past the retention window"""
+    session.add(NoteTombstone(note_id=note_id))
+    session.flush()
+    cutoff = datetime.utcnow() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    # Keep the newest tombstone so expired tokens stay detectable
+    session.exec(NoteTombstone.__table__.delete().where(
+        NoteTombstone.deleted_at < cutoff,
+        NoteTombstone.id < select(func.max(NoteTombstone.id)).scalar_subquery(),
+    ))
+
+
+def get_changes(session: Session, since: Optional[str], limit: int) -> NoteChanges:
+    """Notes created/updated and ids deleted after a sync token"""
+    oldest, newest = session.exec(select(func.min(NoteTombstone.id), func.max(NoteTombstone.id))).one()
+    newest = newest or 0
+    if since:
+        after_seq, after_tombstone = decode_token(since)
+        # Tombstones are pruned oldest first, so a gap means some were lost
+        if oldest is not None and oldest > after_tombstone + 1:
+            raise SyncTokenExpired()
+    else:
+        # First sync: every note, and no deletions to report
+        after_seq, after_tombstone = 0, newest
+
+    # change_seq, not updated_at: it is assigned in commit order, so a write
+    # committing after this read can never land behind the returned token
+    notes = session.exec(
+        select(Note).where(Note.change_seq > after_seq).order_by(Note.change_seq).limit(limit)
+    ).all()
+
+    # A re-used note id is reported as a live note, not a deletion
+    tombstones = session.exec(
+        select(NoteTombstone.id, NoteTombstone.note_id)
+        .where(NoteTombstone.id > after_tombstone, NoteTombstone.id <= newest)
+        .where(~exists().where(Note.id == NoteTombstone.note_id))
+        .order_by(NoteTombstone.id)
+        .limit(limit)
+    ).all()
+    # Skipped (re-used) tombstones still advance the token
+    last_tombstone = tombstones[-1][0] if len(tombstones) == limit else max(newest, after_tombstone)
+
+    if notes:
+        after_seq = notes[-1].change_seq
+    return NoteChanges(
+        notes=notes,
+        deleted=[note_id for _, note_id in tombstones],
+        next_token=encode_token(after_seq, last_tombstone),
+        has_more=len(notes) == limit or len(tombstones) == limit,
+    )
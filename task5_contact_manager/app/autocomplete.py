@@ -0,0 +1,147 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from sqlmodel import Session, select
+from .models import Contact, ContactSuggestion
+from .normalize import normalize_text
+
+AUTOCOMPLETE_MAX_USERS = 1000    # per-user indexes kept in memory (least recently used are evicted)
+AUTOCOMPLETE_TTL_SECONDS = 300   # rebuild after this long, to pick up writes made by other workers
+
+_lock = threading.Lock()
+_indexes: "OrderedDict[int, _UserIndex]" = OrderedDict()
+# [builds in progress, writes seen] for users whose index is being built, so an
+# index built concurrently with a write is not cached; removed when the last build ends
+_builds: Dict[int, List[int]] = {}
+
+
+def _keys(name_norm: str, email_norm: str) -> List[str]:
+    """Prefixes a contact is found by: full name, each later word of it, and email"""
+    words = name_norm.split(" ")
+    keys = {name_norm, email_norm} | {" ".join(words[i:]) for i in range(1, len(words))}
+    return sorted(key for key in keys if key)
+
+
+class _UserIndex:
+    """Sorted (key, contact id) pairs for one user, searched by bisection"""
+
+    def __init__(self, contacts: List[Tuple[int, str, str, str, str]]):
+        self.built_at = time.monotonic()
+        self.entries: List[Tuple[str, int]] = []
+        self.contacts: Dict[int, Tuple[str, str, List[str]]] = {}
+        for contact_id, name, email, name_norm, email_norm in contacts:
+            keys = _keys(name_norm or "", email_norm or "")
+            self.contacts[contact_id] = (name, email, keys)
+            self.entries.extend((key, contact_id) for key in keys)
+        self.entries.sort()
+
+    def add(self, contact_id: int, name: str, email: str, name_norm: str, email_norm: str):
+        keys = _keys(name_norm, email_norm)
+        self.contacts[contact_id] = (name, email, keys)
+        for key in keys:
+            insort(self.entries, (key, contact_id))
+
+    def remove(self, contact_id: int):
+        _, _, keys = self.contacts.pop(contact_id, (None, None, []))
+        for key in keys:
+            position = bisect_left(self.entries, (key, contact_id))
+            if position < len(self.entries) and self.entries[position] == (key, contact_id):
+                del self.entries[position]
+
+    def lookup(self, prefix: str, limit: int) -> List[ContactSuggestion]:
+        suggestions = []
+        seen = set()
+        position = bisect_left(self.entries, (prefix,))
+        while position < len(self.entries) and len(suggestions) < limit:
+            key, contact_id = self.entries[position]
+            if not key.startswith(prefix):
+                break
+            if contact_id not in seen:
+                seen.add(contact_id)
+                name, email, _ = self.contacts[contact_id]
+                suggestions.append(ContactSuggestion(id=contact_id, name=name, email=email))
+            position += 1
+        return suggestions
+
+
+def _load(session: Session, user_id: int) -> _UserIndex:
+    rows = session.exec(
+        select(Contact.id, Contact.name, Contact.email, Contact.name_norm, Contact.email_norm)
+        .where(Contact.user_id == user_id)
+    ).all()
+    return _UserIndex(rows)
+
+
+def autocomplete(session: Session, user_id: int, prefix: str, limit: int) -> List[ContactSuggestion]:
+    """Contacts whose name, a word of their name, or email starts with prefix"""
+    prefix = normalize_text(prefix)
+    if not prefix:
+        # Nothing left after normalizing (e.g. only spaces): every key would match
+        return []
+    with _lock:
+        index = _indexes.get(user_id)
+        if index and time.monotonic() - index.built_at < AUTOCOMPLETE_TTL_SECONDS:
+            _indexes.move_to_end(user_id)
+            return index.lookup(prefix, limit)
+        build = _builds.setdefault(user_id, [0, 0])
+        build[0] += 1
+        writes_before = build[1]
+
+    # Build outside the lock so other users' lookups are not blocked
+    try:
+        index = _load(session, user_id)
+    except Exception:
+        with _lock:
+            _end_build(user_id, build)
+        raise
+    with _lock:
+        _end_build(user_id, build)
+        if build[1] != writes_before:
+            return index.lookup(prefix, limit)
+        _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > AUTOCOMPLETE_MAX_USERS:
+            _indexes.popitem(last=False)
+        return index.lookup(prefix, limit)
+
+
+def _end_build(user_id: int, build: List[int]):
+    """Finish one build; call with _lock held"""
+    build[0] -= 1
+    if not build[0]:
+        del _builds[user_id]
+
+
+def _record_write(user_id: int):
+    """Mark builds in progress for the user as stale; call with _lock held"""
+    build = _builds.get(user_id)
+    if build:
+        build[1] += 1
+
+
+def contact_saved(contact: Contact):
+    """Update the owner's index, if loaded, after a create or update"""
+    with _lock:
+        _record_write(contact.user_id)
+        index = _indexes.get(contact.user_id)
+        if index:
+            index.remove(contact.id)
+            index.add(contact.id, contact.name, contact.email, contact.name_norm, contact.email_norm)
+
+
+def contact_deleted(user_id: int, contact_id: int):
+    """Drop a deleted contact from the owner's index, if loaded"""
+    with _lock:
+        _record_write(user_id)
+        index = _indexes.get(user_id)
+        if index:
+            index.remove(contact_id)
+
+
+def invalidate_user(user_id: int):
+    """Forget a user's index after bulk changes; it is rebuilt on next use"""
+    with _lock:
+        _record_write(user_id)
+        _indexes.pop(user_id, None)
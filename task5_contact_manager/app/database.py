@@ -1,16 +1,141 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import inspect, text
 from typing import Generator
 import os
+from .normalize import normalize_text, normalize_phone, name_key
 
 # Database configuration
 DATABASE_URL = "sqlite:///./contact_manager.db"
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 
+BACKFILL_BATCH_SIZE = 1000
+
+# Columns added after the first release, as (table, column, SQL definition)
+ADDED_COLUMNS = [
+    ("contact", "name_norm", "VARCHAR"),
+    ("contact", "email_norm", "VARCHAR"),
+    ("contact", "phone_norm", "VARCHAR"),
+    ("contact", "name_key", "VARCHAR"),
+    ("contact", "change_seq", "INTEGER"),
+]
+
+# Trigram index over the normalized name/email for infix search, kept in
+# sync by triggers
+SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE contact_fts USING fts5(
+        name_norm, email_norm, content='contact', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER contact_fts_insert AFTER INSERT ON contact BEGIN
+        INSERT INTO contact_fts(rowid, name_norm, email_norm) VALUES (new.id, new.name_norm, new.email_norm);
+    END""",
+    """CREATE TRIGGER contact_fts_delete AFTER DELETE ON contact BEGIN
+        INSERT INTO contact_fts(contact_fts, rowid, name_norm, email_norm)
+        VALUES ('delete', old.id, old.name_norm, old.email_norm);
+    END""",
+    """CREATE TRIGGER contact_fts_update AFTER UPDATE OF name_norm, email_norm ON contact BEGIN
+        INSERT INTO contact_fts(contact_fts, rowid, name_norm, email_norm)
+        VALUES ('delete', old.id, old.name_norm, old.email_norm);
+        INSERT INTO contact_fts(rowid, name_norm, email_norm) VALUES (new.id, new.name_norm, new.email_norm);
+    END""",
+    # Index contacts that existed before the search index
+    "INSERT INTO contact_fts(contact_fts) VALUES ('rebuild')",
+]
+
+
+# Every insert or edit of a contact takes the next number from
+# contactchangecounter. SQLite holds the write lock from that statement until
+# commit, so numbers become visible in order, unlike updated_at, which is set
+# before commit.
+CHANGE_SEQUENCE_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS contact_change_seq_insert AFTER INSERT ON contact BEGIN
+        UPDATE contactchangecounter SET value = value + 1 WHERE id = 1;
+        UPDATE contact SET change_seq = (SELECT value FROM contactchangecounter WHERE id = 1) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS contact_change_seq_update AFTER UPDATE OF name, email, phone, updated_at ON contact BEGIN
+        UPDATE contactchangecounter SET value = value + 1 WHERE id = 1;
+        UPDATE contact SET change_seq = (SELECT value FROM contactchangecounter WHERE id = 1) WHERE id = new.id;
+    END""",
+]
+
+
+def add_missing_columns():
+    """Add newer columns to tables created by an older version"""
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table, column, definition in ADDED_COLUMNS:
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            if column not in existing:
+                connection.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {definition}'))
+
+
+def backfill_search_keys():
+    """Fill normalized search and duplicate-matching columns of contacts saved before they existed"""
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(text("""
+                SELECT id, name, email, phone FROM contact
+                WHERE name_norm IS NULL OR email_norm IS NULL OR phone_norm IS NULL OR name_key IS NULL
+                LIMIT :batch
+            """), {"batch": BACKFILL_BATCH_SIZE}).all()
+            if not rows:
+                return
+            connection.execute(
+                text("""UPDATE contact SET name_norm = :name_norm, email_norm = :email_norm,
+                        phone_norm = :phone_norm, name_key = :name_key WHERE id = :id"""),
+                [{
+                    "id": id,
+                    "name_norm": normalize_text(name),
+                    "email_norm": normalize_text(email),
+                    "phone_norm": normalize_phone(phone),
+                    "name_key": name_key(normalize_text(name)),
+                } for id, name, email, phone in rows]
+            )
+
+
+def create_change_sequence():
+    """Number contacts saved before change_seq existed, then install its counter and triggers"""
+    with engine.begin() as connection:
+        base = connection.execute(text("SELECT COALESCE(MAX(change_seq), 0) FROM contact")).scalar()
+        connection.execute(text("""
+            UPDATE contact SET change_seq = :base + ordered.position
+            FROM (SELECT id, ROW_NUMBER() OVER (ORDER BY updated_at, id) AS position
+                  FROM contact WHERE change_seq IS NULL) AS ordered
+            WHERE ordered.id = contact.id
+        """), {"base": base})
+        connection.execute(text("INSERT OR IGNORE INTO contactchangecounter (id, value) VALUES (1, 0)"))
+        connection.execute(text("""
+            UPDATE contactchangecounter
+            SET value = MAX(value, COALESCE((SELECT MAX(change_seq) FROM contact), 0))
+            WHERE id = 1
+        """))
+        for statement in CHANGE_SEQUENCE_DDL:
+            connection.exec_driver_sql(statement)
+
+
+def create_search_index():
+    """Create the trigram search index if it does not exist yet"""
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'contact_fts'")
+        ).scalar()
+        if exists:
+            return
+        for statement in SEARCH_INDEX_DDL:
+            connection.exec_driver_sql(statement)
+
 
 def create_db_and_tables():
     """Create database and tables"""
     SQLModel.metadata.create_all(engine)
+    add_missing_columns()
+    # create_all skips indexes of tables that already exist
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    backfill_search_keys()
+    create_change_sequence()
+    create_search_index()
 
 
 def get_session() -> Generator[Session, None, None]:
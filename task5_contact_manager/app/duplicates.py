@@ -0,0 +1,99 @@
+from datetime import datetime
+from typing import Dict, List
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlmodel import Session, select
+from .models import Contact, ContactMerge, DuplicateCluster
+from .normalize import set_search_keys
+from .sync import record_tombstone
+
+# (column, reason) pairs; contacts sharing a non-empty value are candidates
+BLOCKING_KEYS = [
+    (Contact.phone_norm, "phone"),
+    (Contact.email_norm, "email"),
+    (Contact.name_key, "name"),
+]
+
+
+def _find(parent: Dict[int, int], item: int) -> int:
+    while parent[item] != item:
+        parent[item] = parent[parent[item]]
+        item = parent[item]
+    return item
+
+
+def find_duplicates(session: Session, user_id: int, limit: int) -> List[DuplicateCluster]:
+    """Clusters of contacts that share a phone, email or sound-alike name"""
+    parent: Dict[int, int] = {}
+    group_reasons = []
+
+    # Each key is one pass over its (user_id, key) index: no pairwise comparison
+    for column, reason in BLOCKING_KEYS:
+        shared = (
+            select(column)
+            .where(Contact.user_id == user_id, column != "")
+            .group_by(column)
+            .having(func.count() > 1)
+        )
+        rows = session.exec(
+            select(column, Contact.id)
+            .where(Contact.user_id == user_id, column.in_(shared))
+            .order_by(column)
+        ).all()
+
+        group_key, group_first = None, None
+        for key, contact_id in rows:
+            parent.setdefault(contact_id, contact_id)
+            if key != group_key:
+                group_key, group_first = key, contact_id
+                group_reasons.append((contact_id, reason))
+            else:
+                parent[_find(parent, contact_id)] = _find(parent, group_first)
+
+    clusters: Dict[int, List[int]] = {}
+    for contact_id in parent:
+        clusters.setdefault(_find(parent, contact_id), []).append(contact_id)
+    reasons: Dict[int, set] = {}
+    for contact_id, reason in group_reasons:
+        reasons.setdefault(_find(parent, contact_id), set()).add(reason)
+
+    roots = sorted(clusters, key=lambda root: min(clusters[root]))[:limit]
+    wanted = [contact_id for root in roots for contact_id in clusters[root]]
+    contacts = {
+        contact.id: contact
+        for contact in session.exec(select(Contact).where(Contact.id.in_(wanted))).all()
+    } if wanted else {}
+    return [
+        DuplicateCluster(
+            reasons=[reason for _, reason in BLOCKING_KEYS if reason in reasons[root]],
+            contacts=[contacts[contact_id] for contact_id in sorted(clusters[root])]
+        )
+        for root in roots
+    ]
+
+
+def merge_contacts(session: Session, user_id: int, merge: ContactMerge) -> Contact:
+    """Fold duplicates into the primary contact and delete them; the caller commits"""
+    ids = {merge.primary_id, *merge.duplicate_ids}
+    if len(ids) != len(merge.duplicate_ids) + 1:
+        raise HTTPException(status_code=400, detail="Contact ids must be distinct")
+    contacts = {
+        contact.id: contact
+        for contact in session.exec(
+            select(Contact).where(Contact.user_id == user_id, Contact.id.in_(ids))
+        ).all()
+    }
+    if len(contacts) != len(ids):
+        raise HTTPException(status_code=404, detail="Contact not found")
+
+    primary = contacts[merge.primary_id]
+    for field, value in merge.dict(include={"name", "email", "phone"}, exclude_none=True).items():
+        setattr(primary, field, value)
+    set_search_keys(primary)
+    primary.updated_at = datetime.utcnow()
+    session.add(primary)
+
+    for contact_id in merge.duplicate_ids:
+        session.delete(contacts[contact_id])
+        record_tombstone(session, user_id, contact_id)
+    return primary
@@ -0,0 +1,223 @@
+import base64
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+from sqlalchemy import and_, insert, or_
+from sqlmodel import Session, select
+from .database import engine
+from .models import IPLogEntry
+
+LEGACY_LOG_FILE = "ip_logs.json"
+
+RING_BUFFER_SIZE = 10000         # recent entries held in memory awaiting persistence
+FLUSH_INTERVAL_SECONDS = 1.0
+LEGACY_IMPORT_BATCH_SIZE = 1000
+LEGACY_READ_SIZE = 64 * 1024
+STREAM_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+# Exposed on /health
+ip_log_metrics = {
+    "buffered": 0,
+    "persisted": 0,
+    "overwritten": 0,
+    "flushes": 0,
+    "legacy_imported": 0,
+    "last_error": None,
+}
+
+_ring = deque(maxlen=RING_BUFFER_SIZE)
+_ring_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_sequence = 0
+_persisted_sequence = 0
+_stop_event = threading.Event()
+_thread = None
+
+
+def record_ip(entry: dict):
+    """Add a request to the ring buffer; O(1), never touches disk"""
+    global _sequence
+    with _ring_lock:
+        _sequence += 1
+        if len(_ring) == RING_BUFFER_SIZE and _ring[0][0] > _persisted_sequence:
+            # The writer fell a full ring behind; the oldest entry is lost
+            ip_log_metrics["overwritten"] += 1
+        _ring.append((_sequence, entry))
+        ip_log_metrics["buffered"] = _sequence - _persisted_sequence
+
+
+def flush_ip_log() -> int:
+    """Persist buffered entries to SQLite in one transaction"""
+    global _persisted_sequence
+    with _flush_lock:
+        with _ring_lock:
+            pending = [(seq, entry) for seq, entry in _ring if seq > _persisted_sequence]
+        if not pending:
+            return 0
+
+        with Session(engine) as session:
+            session.exec(insert(IPLogEntry), params=[entry for _, entry in pending])
+            session.commit()
+
+        with _ring_lock:
+            _persisted_sequence = pending[-1][0]
+            ip_log_metrics["buffered"] = _sequence - _persisted_sequence
+        ip_log_metrics["persisted"] += len(pending)
+        ip_log_metrics["flushes"] += 1
+        return len(pending)
+
+
+def encode_cursor(entry: IPLogEntry) -> str:
+    """Opaque cursor pointing after a log entry"""
+    payload = json.dumps([entry.timestamp.isoformat(), entry.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor"""
+    timestamp, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(timestamp), int(entry_id)
+
+
+def log_query(
+    ip: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None
+):
+    """Filtered log entries, newest first, after an optional cursor"""
+    query = select(IPLogEntry)
+    if ip:
+        query = query.where(IPLogEntry.ip_address == ip)
+    if since:
+        query = query.where(IPLogEntry.timestamp >= since)
+    if until:
+        query = query.where(IPLogEntry.timestamp < until)
+    if cursor:
+        # Keyset on (timestamp, id): each page is an index range, not an OFFSET scan
+        after_timestamp, after_id = decode_cursor(cursor)
+        query = query.where(or_(
+            IPLogEntry.timestamp < after_timestamp,
+            and_(IPLogEntry.timestamp == after_timestamp, IPLogEntry.id < after_id),
+        ))
+    return query.order_by(IPLogEntry.timestamp.desc(), IPLogEntry.id.desc())
+
+
+def stream_logs_ndjson(**filters) -> Iterator[str]:
+    """Stream matching entries as NDJSON, fetching rows in batches"""
+    # Own session: the stream outlives the request's dependency session
+    with Session(engine) as session:
+        result = session.exec(log_query(**filters).execution_options(yield_per=STREAM_BATCH_SIZE))
+        for batch in result.partitions():
+            yield "".join(
+                json.dumps({
+                    "timestamp": entry.timestamp.isoformat(),
+                    "ip_address": entry.ip_address,
+                    "method": entry.method,
+                    "url": entry.url,
+                    "user_agent": entry.user_agent,
+                }) + "\n"
+                for entry in batch
+            )
+
+
+def _iter_legacy_entries(path: str):
+    """Yield the entries of the old JSON array log, reading it in chunks"""
+    decoder = json.JSONDecoder()
+    with open(path) as f:
+        buffer, position, eof = "", 0, False
+        read_size = LEGACY_READ_SIZE
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+                position += 1
+            if position < len(buffer):
+                try:
+                    item, position = decoder.raw_decode(buffer, position)
+                    read_size = LEGACY_READ_SIZE
+                    yield item
+                    continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    read_size = max(read_size, len(buffer) - position)
+            elif eof:
+                return
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+
+def _legacy_row(item: dict) -> dict:
+    return {
+        "timestamp": datetime.fromisoformat(item["timestamp"]),
+        "ip_address": item["ip_address"],
+        "method": item["method"],
+        "url": item["url"],
+        "user_agent": item.get("user_agent", "Unknown"),
+    }
+
+
+def import_legacy_log(path: str = LEGACY_LOG_FILE) -> int:
+    """Move entries from the old ip_logs.json into SQLite, then set the file aside"""
+    if not os.path.exists(path):
+        return 0
+    imported = 0
+    batch = []
+    with Session(engine) as session:
+        for item in _iter_legacy_entries(path):
+            batch.append(_legacy_row(item))
+            if len(batch) >= LEGACY_IMPORT_BATCH_SIZE:
+                session.exec(insert(IPLogEntry), params=batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            session.exec(insert(IPLogEntry), params=batch)
+            imported += len(batch)
+        # One transaction, so a crash mid-import never leaves half the file imported
+        session.commit()
+    os.replace(path, path + ".imported")
+    ip_log_metrics["legacy_imported"] += imported
+    return imported
+
+
+def _run_writer():
+    """Import the legacy log once, then flush the ring buffer periodically"""
+    try:
+        imported = import_legacy_log()
+        if imported:
+            logger.info("Imported %d entries from %s", imported, LEGACY_LOG_FILE)
+    except Exception as e:
+        logger.exception("Importing %s failed", LEGACY_LOG_FILE)
+        ip_log_metrics["last_error"] = str(e)
+
+    while not _stop_event.wait(FLUSH_INTERVAL_SECONDS):
+        try:
+            flush_ip_log()
+        except Exception as e:
+            logger.exception("IP log flush failed")
+            ip_log_metrics["last_error"] = str(e)
+
+
+def start_ip_log_writer():
+    """Start the background IP log writer thread"""
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop_event.clear()
+    _thread = threading.Thread(target=_run_writer, name="ip-log-writer", daemon=True)
+    _thread.start()
+
+
+def stop_ip_log_writer():
+    """Stop the writer and persist whatever is still buffered"""
+    _stop_event.set()
+    if _thread:
+        _thread.join(timeout=30)
+    flush_ip_log()
@@ -1,10 +1,15 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
-import json
-import os
+from typing import Optional
 from datetime import datetime
 from .database import engine, create_db_and_tables, get_session
+from .models import IPLogPage
+from .ip_log import (
+    record_ip, flush_ip_log, start_ip_log_writer, stop_ip_log_writer, ip_log_metrics,
+    log_query, encode_cursor, decode_cursor, stream_logs_ndjson
+)
 from .routers import contacts, users
 from .auth import create_default_user
 
@@ -28,32 +33,15 @@ app.add_middleware(
 async def log_ip_address(request: Request, call_next):
     """Middleware to log IP address of every request"""
     client_ip = request.client.host
-    user_agent = request.headers.get("user-agent", "Unknown")
-    method = request.method
-    url = str(request.url)
-    timestamp = datetime.utcnow().isoformat()
-
-    # Log to file
-    log_entry = {
-        "timestamp": timestamp,
-        "ip_address": client_ip,
-        "method": method,
-        "url": url,
-        "user_agent": user_agent
-    }
-
-    # Save to IP log file
-    ip_log_file = "ip_logs.json"
-    if os.path.exists(ip_log_file):
-        with open(ip_log_file, "r") as f:
-            logs = json.load(f)
-    else:
-        logs = []
 
-    logs.append(log_entry)
-
-    with open(ip_log_file, "w") as f:
-        json.dump(logs, f, indent=2)
+    # Buffered in memory; a background thread persists it to SQLite
+    record_ip({
+        "timestamp": datetime.utcnow(),
+        "ip_address": client_ip,
+        "method": request.method,
+        "url": str(request.url),
+        "user_agent": request.headers.get("user-agent", "Unknown")
+    })
 
     response = await call_next(request)
     response.headers["X-Client-IP"] = client_ip
@@ -68,6 +56,13 @@ def on_startup():
     session = Session(engine)
     create_default_user(session)
     session.close()
+    start_ip_log_writer()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """Persist buffered IP log entries"""
+    stop_ip_log_writer()
 
 
 # Include routers
@@ -98,17 +93,37 @@ def health_check():
     return {
         "status": "healthy",
         "service": "contact-manager-api",
+        "ip_log": ip_log_metrics,
         "timestamp": datetime.utcnow()
     }
 
 
-@app.get("/logs")
-def get_logs():
-    """get logs endpoint"""
-    ip_log_file = "ip_logs.json"
-    if os.path.exists(ip_log_file):
-        with open(ip_log_file, "r") as f:
-            logs = json.load(f)
-            return {"logs": logs}
-    else:
-        return {"logs": [], "message": "No logs found"}
\ No newline at end of file
+@app.get("/logs", response_model=IPLogPage)
+def get_logs(
+    ip: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$", description="json page or ndjson stream"),
+    session: Session = Depends(get_session)
+):
+    """get logs endpoint, newest first"""
+    # Include requests still waiting in the ring buffer
+    flush_ip_log()
+
+    try:
+        if format == "ndjson":
+            if cursor:
+                decode_cursor(cursor)
+            # Every matching entry, in constant memory
+            return StreamingResponse(
+                stream_logs_ndjson(ip=ip, since=since, until=until, cursor=cursor),
+                media_type="application/x-ndjson"
+            )
+        logs = session.exec(log_query(ip, since, until, cursor).limit(limit)).all()
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    next_cursor = encode_cursor(logs[-1]) if len(logs) == limit else None
+    return IPLogPage(logs=logs, next_cursor=next_cursor)
@@ -1,5 +1,6 @@
 from typing import Optional, List
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from datetime import datetime
 
 
@@ -32,9 +33,25 @@ class ContactBase(SQLModel):
 
 
 class Contact(ContactBase, table=True):
+    __table_args__ = (
+        Index("ix_contact_user_id_name_norm", "user_id", "name_norm"),
+        Index("ix_contact_user_id_email_norm", "user_id", "email_norm"),
+        Index("ix_contact_user_id_phone_norm", "user_id", "phone_norm"),
+        Index("ix_contact_user_id_name_key", "user_id", "name_key"),
+        Index("ix_contact_user_id_change_seq", "user_id", "change_seq"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
+    # Lowercase, accent-free copies of name/email for indexed search
+    name_norm: Optional[str] = None
+    email_norm: Optional[str] = None
+    # Blocking keys for duplicate detection: phone digits and a Soundex name key
+    phone_norm: Optional[str] = None
+    name_key: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Assigned by a database trigger on every write, in commit order (see database.py)
+    change_seq: Optional[int] = None
     user: Optional[User] = Relationship(back_populates="contacts")
 
 
@@ -56,6 +73,90 @@ class ContactRead(ContactBase):
     updated_at: datetime
 
 
+class ContactChangeCounter(SQLModel, table=True):
+    """Single-row counter that numbers contact writes for delta sync"""
+    id: int = Field(default=1, primary_key=True)
+    value: int = 0
+
+
+class ContactTombstone(SQLModel, table=True):
+    """Deletion log entry, so sync clients learn which contacts went away"""
+    # Never reuse ids: they are the deletion part of a sync token
+    __table_args__ = (
+        Index("ix_contacttombstone_user_id_id", "user_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    contact_id: int
+    deleted_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class ContactChanges(SQLModel):
+    contacts: List[ContactRead]
+    deleted: List[int]
+    next_token: str
+    has_more: bool
+
+
+class DuplicateCluster(SQLModel):
+    reasons: List[str]
+    contacts: List[ContactRead]
+
+
+class ContactMerge(SQLModel):
+    primary_id: int
+    duplicate_ids: List[int] = Field(min_length=1, max_length=100)
+    # Values for the merged contact; unset fields keep the primary's
+    name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+
+
+class ImportRowError(SQLModel):
+    row: int
+    error: str
+
+
+class ImportResult(SQLModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+
+
+class ContactSuggestion(SQLModel):
+    id: int
+    name: str
+    email: str
+
+
+class IPLogEntry(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_iplogentry_ip_address_timestamp", "ip_address", "timestamp"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    timestamp: datetime = Field(index=True)
+    ip_address: str
+    method: str
+    url: str
+    user_agent: str
+
+
+class IPLogRead(SQLModel):
+    timestamp: datetime
+    ip_address: str
+    method: str
+    url: str
+    user_agent: str
+
+
+class IPLogPage(SQLModel):
+    logs: List[IPLogRead]
+    next_cursor: Optional[str] = None
+
+
 class Token(SQLModel):
     access_token: str
     token_type: str
@@ -0,0 +1,60 @@
+import re
+import unicodedata
+from typing import Optional
+
+_WHITESPACE = re.compile(r"\s+")
+_NON_DIGITS = re.compile(r"\D")
+
+# Phones with fewer digits are too ambiguous to match duplicates on
+MIN_PHONE_DIGITS = 5
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"), **dict.fromkeys("dt", "3"),
+    "l": "4", **dict.fromkeys("mn", "5"), "r": "6",
+}
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Lowercase, accent-free, single-spaced form used for searching"""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _WHITESPACE.sub(" ", stripped.casefold()).strip()
+
+
+def normalize_phone(value: Optional[str]) -> str:
+    """Digits of a phone number, without an international 00 prefix"""
+    digits = _NON_DIGITS.sub("", value or "")
+    if digits.startswith("00"):
+        digits = digits[2:]
+    return digits if len(digits) >= MIN_PHONE_DIGITS else ""
+
+
+def soundex(word: str) -> str:
+    """Classic four-character Soundex code of an ASCII word"""
+    letters = [ch for ch in word if "a" <= ch <= "z"]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for ch in letters[1:]:
+        digit = _SOUNDEX_CODES.get(ch, "")
+        if digit and digit != previous:
+            code += digit
+        if ch not in "hw":
+            previous = digit
+    return (code + "000")[:4]
+
+
+def name_key(name_norm: str) -> str:
+    """Order-independent sound-alike key of a normalized name"""
+    return " ".join(sorted(filter(None, (soundex(word) for word in name_norm.split(" ")))))
+
+
+def set_search_keys(contact):
+    """Refresh a contact's normalized search and duplicate-matching columns from its fields"""
+    contact.name_norm = normalize_text(contact.name)
+    contact.email_norm = normalize_text(contact.email)
+    contact.phone_norm = normalize_phone(contact.phone)
+    contact.name_key = name_key(contact.name_norm)
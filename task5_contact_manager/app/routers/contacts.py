@@ -1,10 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
-from typing import List
+import tempfile
+from typing import List, Optional
 from datetime import datetime
-from ..models import Contact, ContactCreate, ContactUpdate, ContactRead, User
+from ..models import (
+    Contact, ContactCreate, ContactUpdate, ContactRead, ContactSuggestion, ContactMerge, DuplicateCluster,
+    ContactChanges, ImportResult, User
+)
 from ..database import get_session
 from ..auth import get_current_user
+from ..normalize import normalize_text, set_search_keys
+from ..search import search_contacts
+from ..autocomplete import autocomplete, contact_saved, contact_deleted, invalidate_user
+from ..duplicates import find_duplicates, merge_contacts
+from ..sync import get_changes, record_tombstone, SyncTokenExpired
+from ..transfer import (
+    CSV_CONTENT_TYPES, VCARD_CONTENT_TYPES, SPOOL_MAX_SIZE,
+    iter_csv_rows, iter_vcard_rows, import_contacts, export_contacts_csv, export_contacts_vcard, spool_utf8
+)
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
@@ -20,12 +35,65 @@ def create_contact(
         **contact.dict(),
         user_id=current_user.id
     )
+    set_search_keys(db_contact)
     session.add(db_contact)
     session.commit()
     session.refresh(db_contact)
+    contact_saved(db_contact)
     return db_contact
 
 
+@router.post("/import", response_model=ImportResult)
+async def import_contacts_file(
+    request: Request,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Bulk import contacts from a CSV or vCard body"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in CSV_CONTENT_TYPES:
+        parse_rows = iter_csv_rows
+    elif content_type in VCARD_CONTENT_TYPES:
+        parse_rows = iter_vcard_rows
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Body must be CSV (text/csv) or vCard (text/vcard)"
+        )
+
+    # Spool the upload so large bodies are never held in memory at once
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as body:
+        try:
+            await spool_utf8(request.stream(), body)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Body must be UTF-8 encoded")
+        result = await run_in_threadpool(
+            import_contacts, session, current_user.id, parse_rows(body)
+        )
+
+    invalidate_user(current_user.id)
+    return result
+
+
+@router.get("/export")
+def export_contacts_file(
+    format: str = Query("csv", pattern="^(csv|vcard)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream all contacts of the current user as CSV or vCard"""
+    if format == "vcard":
+        return StreamingResponse(
+            export_contacts_vcard(current_user.id),
+            media_type="text/vcard",
+            headers={"Content-Disposition": 'attachment; filename="contacts.vcf"'}
+        )
+    return StreamingResponse(
+        export_contacts_csv(current_user.id),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="contacts.csv"'}
+    )
+
+
 @router.get("/", response_model=List[ContactRead])
 def get_contacts(
     skip: int = 0,
@@ -43,6 +111,79 @@ def get_contacts(
     return contacts
 
 
+@router.get("/changes", response_model=ContactChanges)
+def get_contact_changes(
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Contacts changed and deleted since a sync token; omit `since` for a full sync"""
+    try:
+        return get_changes(session, current_user.id, since, limit)
+    except SyncTokenExpired:
+        raise HTTPException(status_code=410, detail="Sync token expired, start a full sync")
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+
+@router.get("/search", response_model=List[ContactRead])
+def search_contacts_combined(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Search contacts by name or email, case-insensitively; prefix matches first"""
+    try:
+        contacts, next_cursor = search_contacts(session, current_user.id, q, limit, cursor)
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid search query or cursor")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return contacts
+
+
+@router.get("/autocomplete", response_model=List[ContactSuggestion])
+def autocomplete_contacts(
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Type-ahead suggestions from an in-memory index of the user's contacts"""
+    return autocomplete(session, current_user.id, prefix, limit)
+
+
+@router.get("/duplicates", response_model=List[DuplicateCluster])
+def get_duplicate_contacts(
+    limit: int = Query(100, ge=1, le=1000),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Groups of contacts that look like the same person"""
+    return find_duplicates(session, current_user.id, limit)
+
+
+@router.post("/merge", response_model=ContactRead)
+def merge_duplicate_contacts(
+    merge: ContactMerge,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Merge duplicates into one contact, deleting the others"""
+    contact = merge_contacts(session, current_user.id, merge)
+    session.commit()
+    session.refresh(contact)
+
+    contact_saved(contact)
+    for contact_id in merge.duplicate_ids:
+        contact_deleted(current_user.id, contact_id)
+    return contact
+
+
 @router.get("/{contact_id}", response_model=ContactRead)
 def get_contact(
     contact_id: int,
@@ -84,6 +225,7 @@ def update_contact(
     contact_data = contact_update.dict(exclude_unset=True)
     for field, value in contact_data.items():
         setattr(contact, field, value)
+    set_search_keys(contact)
 
     # Update the updated_at timestamp
     contact.updated_at = datetime.utcnow()
@@ -91,6 +233,7 @@ def update_contact(
     session.add(contact)
     session.commit()
     session.refresh(contact)
+    contact_saved(contact)
     return contact
 
 
@@ -112,37 +255,41 @@ def delete_contact(
         raise HTTPException(status_code=404, detail="Contact not found")
 
     session.delete(contact)
+    record_tombstone(session, current_user.id, contact_id)
     session.commit()
+    contact_deleted(current_user.id, contact_id)
     return {"message": "Contact deleted successfully"}
 
 
-@router.get("/search/by-name")
+@router.get("/search/by-name", response_model=List[ContactRead], deprecated=True)
 def search_contacts_by_name(
     name: str,
+    limit: int = Query(100, ge=1, le=500),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """Search contacts by name"""
+    """Search contacts by name (use /contacts/search)"""
     contacts = session.exec(
         select(Contact).where(
             Contact.user_id == current_user.id,
-            Contact.name.contains(name)
-        )
+            Contact.name_norm.contains(normalize_text(name))
+        ).limit(limit)
     ).all()
     return contacts
 
 
-@router.get("/search/by-email")
+@router.get("/search/by-email", response_model=List[ContactRead], deprecated=True)
 def search_contacts_by_email(
     email: str,
+    limit: int = Query(100, ge=1, le=500),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """Search contacts by email"""
+    """Search contacts by email (use /contacts/search)"""
     contacts = session.exec(
         select(Contact).where(
             Contact.user_id == current_user.id,
-            Contact.email.contains(email)
-        )
+            Contact.email_norm.contains(normalize_text(email))
+        ).limit(limit)
     ).all()
     return contacts
@@ -0,0 +1,91 @@
+import base64
+import json
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, column, or_, table, text, union
+from sqlmodel import Session, select
+from .models import Contact
+from .normalize import normalize_text
+
+# Trigram matching needs at least three characters
+MIN_INFIX_LENGTH = 3
+
+_contact_fts = table("contact_fts", column("rowid"))
+
+
+def encode_cursor(phase: str, contact: Contact) -> str:
+    """Opaque cursor pointing after a search result"""
+    payload = json.dumps({"phase": phase, "name": contact.name_norm, "id": contact.id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Optional[str], int]:
+    """Inverse of encode_cursor"""
+    payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if payload["phase"] not in ("prefix", "infix"):
+        raise ValueError("unknown cursor phase")
+    return payload["phase"], payload["name"], int(payload["id"])
+
+
+def _prefix_range(column_, q: str):
+    # A range instead of LIKE 'q%' so SQLite can seek the (user_id, column) index
+    return and_(column_ >= q, column_ < q + "\U0010ffff")
+
+
+def _prefix_ids(user_id: int, q: str):
+    """Ids whose name or email starts with q, one index range each"""
+    return union(
+        select(Contact.id).where(Contact.user_id == user_id, _prefix_range(Contact.name_norm, q)),
+        select(Contact.id).where(Contact.user_id == user_id, _prefix_range(Contact.email_norm, q)),
+    )
+
+
+def _prefix_matches(session: Session, user_id: int, q: str, after: Optional[Tuple[str, int]], limit: int) -> List[Contact]:
+    query = select(Contact).where(Contact.id.in_(_prefix_ids(user_id, q)))
+    if after:
+        after_name, after_id = after
+        query = query.where(or_(
+            Contact.name_norm > after_name,
+            and_(Contact.name_norm == after_name, Contact.id > after_id),
+        ))
+    return session.exec(query.order_by(Contact.name_norm, Contact.id).limit(limit)).all()
+
+
+def _infix_matches(session: Session, user_id: int, q: str, after_id: int, limit: int) -> List[Contact]:
+    """Substring matches from the trigram index, minus those already returned as prefix matches"""
+    phrase = '"' + q.replace('"', '""') + '"'
+    query = (
+        select(Contact)
+        .join(_contact_fts, _contact_fts.c.rowid == Contact.id)
+        .where(text("contact_fts MATCH :phrase").bindparams(phrase=phrase))
+        .where(Contact.user_id == user_id, Contact.id > after_id)
+        .where(Contact.id.not_in(_prefix_ids(user_id, q)))
+        .order_by(Contact.id)
+        .limit(limit)
+    )
+    return session.exec(query).all()
+
+
+def search_contacts(
+    session: Session, user_id: int, q: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[Contact], Optional[str]]:
+    """Prefix matches (by name) followed by infix matches (by id), and the next page's cursor"""
+    q = normalize_text(q)
+    if not q:
+        raise ValueError("Search query is empty")
+    phase, after_name, after_id = decode_cursor(cursor) if cursor else ("prefix", None, 0)
+
+    results = []
+    if phase == "prefix":
+        after = (after_name, after_id) if cursor else None
+        results = _prefix_matches(session, user_id, q, after, limit)
+        if len(results) == limit:
+            return results, encode_cursor("prefix", results[-1])
+        phase, after_id = "infix", 0
+
+    if len(q) < MIN_INFIX_LENGTH:
+        return results, None
+    remaining = limit - len(results)
+    infix = _infix_matches(session, user_id, q, after_id, remaining)
+    results.extend(infix)
+    next_cursor = encode_cursor("infix", infix[-1]) if infix and len(infix) == remaining else None
+    return results, next_cursor
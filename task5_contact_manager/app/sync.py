@@ -0,0 +1,86 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from sqlalchemy import exists, func
+from sqlmodel import Session, select
+from .models import Contact, ContactTombstone, ContactChanges
+
+# Tombstones older than this are pruned; tokens that still need them expire
+TOMBSTONE_RETENTION_DAYS = 30
+
+
+class SyncTokenExpired(Exception):
+    """The deletions a token needs have already been pruned"""
+
+
+def encode_token(change_seq: int, tombstone_id: int) -> str:
+    """Opaque sync token: last contact change_seq seen and last tombstone id"""
+    return base64.urlsafe_b64encode(json.dumps([change_seq, tombstone_id]).encode()).decode()
+
+
+def decode_token(token: str) -> Tuple[int, int]:
+    """Inverse of encode_token"""
+    payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+    if isinstance(payload, list) and len(payload) == 3:
+        # Issued before tokens used change_seq
+        raise SyncTokenExpired()
+    change_seq, tombstone_id = payload
+    return int(change_seq), int(tombstone_id)
+
+
+def record_tombstone(session: Session, user_id: int, contact_id: int):
+    """Log a contact deletion and prune tombstones past the retention window"""
+    session.add(ContactTombstone(user_id=user_id, contact_id=contact_id))
+    session.flush()
+    cutoff = datetime.utcnow() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    # Keep the newest tombstone so expired tokens stay detectable
+    session.exec(ContactTombstone.__table__.delete().where(
+        ContactTombstone.deleted_at < cutoff,
+        ContactTombstone.id < select(func.max(ContactTombstone.id)).scalar_subquery(),
+    ))
+
+
+def get_changes(session: Session, user_id: int, since: Optional[str], limit: int) -> ContactChanges:
+    """A user's contacts created/updated and ids deleted after a sync token"""
+    # Tombstone ids are global, so pruning is detected across all users
+    oldest, newest = session.exec(select(func.min(ContactTombstone.id), func.max(ContactTombstone.id))).one()
+    newest = newest or 0
+    if since:
+        after_seq, after_tombstone = decode_token(since)
+        # Tombstones are pruned oldest first, so a gap means some may be lost
+        if oldest is not None and oldest > after_tombstone + 1:
+            raise SyncTokenExpired()
+    else:
+        # First sync: every contact, and no deletions to report
+        after_seq, after_tombstone = 0, newest
+
+    # change_seq, not updated_at: it is assigned in commit order, so a write
+    # committing after this read can never land behind the returned token
+    contacts = session.exec(
+        select(Contact)
+        .where(Contact.user_id == user_id, Contact.change_seq > after_seq)
+        .order_by(Contact.change_seq)
+        .limit(limit)
+    ).all()
+
+    # A re-used contact id is reported as a live contact, not a deletion
+    tombstones = session.exec(
+        select(ContactTombstone.id, ContactTombstone.contact_id)
+        .where(ContactTombstone.user_id == user_id)
+        .where(ContactTombstone.id > after_tombstone, ContactTombstone.id <= newest)
+        .where(~exists().where(Contact.id == ContactTombstone.contact_id, Contact.user_id == user_id))
+        .order_by(ContactTombstone.id)
+        .limit(limit)
+    ).all()
+    # Other users' and skipped tombstones still advance the token
+    last_tombstone = tombstones[-1][0] if len(tombstones) == limit else max(newest, after_tombstone)
+
+    if contacts:
+        after_seq = contacts[-1].change_seq
+    return ContactChanges(
+        contacts=contacts,
+        deleted=[contact_id for _, contact_id in tombstones],
+        next_token=encode_token(after_seq, last_tombstone),
+        has_more=len(contacts) == limit or len(tombstones) == limit,
+    )
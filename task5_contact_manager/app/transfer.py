@@ -0,0 +1,204 @@
+import codecs
+import csv
+import io
+from typing import IO, AsyncIterator, Iterator, Optional, Tuple
+from pydantic import ValidationError
+from sqlmodel import Session, select
+from .database import engine
+from .models import Contact, ContactCreate, ImportResult, ImportRowError
+from .normalize import set_search_keys
+
+IMPORT_CHUNK_SIZE = 500
+EXPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+SPOOL_MAX_SIZE = 1024 * 1024  # request bodies above 1 MB are spooled to disk
+
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+VCARD_CONTENT_TYPES = {"text/vcard", "text/x-vcard", "text/directory"}
+
+EXPORT_COLUMNS = ["name", "email", "phone"]
+
+
+async def spool_utf8(chunks: AsyncIterator[bytes], body: IO[bytes]):
+    """Copy an upload into body, raising UnicodeDecodeError if it is not UTF-8"""
+    # Checked before parsing, so a bad byte never leaves earlier chunks committed
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    async for chunk in chunks:
+        decoder.decode(chunk)
+        body.write(chunk)
+    decoder.decode(b"", final=True)
+    body.seek(0)
+
+
+def iter_csv_rows(body: IO[bytes]) -> Iterator[Tuple[int, Optional[dict]]]:
+    """Yield (row number, fields) from a CSV body with name/email/phone columns"""
+    reader = csv.DictReader(codecs.iterdecode(body, "utf-8-sig"))
+    for row_number, row in enumerate(reader, start=1):
+        yield row_number, {
+            key.strip().lower(): value.strip() for key, value in row.items()
+            if key and value not in (None, "")
+        }
+
+
+def _unescape(value: str) -> str:
+    """Undo vCard text escaping (\\n, \\, \\; \\\\)"""
+    out = []
+    chars = iter(value)
+    for ch in chars:
+        if ch == "\\":
+            nxt = next(chars, "")
+            out.append("\n" if nxt in "nN" else nxt)
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace("\n", "\\n").replace(",", "\\,").replace(";", "\\;")
+    )
+
+
+def _unfold(lines: Iterator[str]) -> Iterator[str]:
+    """Join folded vCard lines (continuations start with a space or tab)"""
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def iter_vcard_rows(body: IO[bytes]) -> Iterator[Tuple[int, Optional[dict]]]:
+    """Yield (card number, fields) from a vCard stream, one card at a time"""
+    card = None
+    card_number = 0
+    for line in _unfold(codecs.iterdecode(body, "utf-8-sig")):
+        if not line.strip():
+            continue
+        name, _, value = line.partition(":")
+        # Drop the group prefix (item1.EMAIL) and parameters (TEL;TYPE=CELL)
+        prop = name.split(";")[0].split(".")[-1].upper()
+
+        if prop == "BEGIN" and value.strip().upper() == "VCARD":
+            if card is not None:
+                # Previous card never ended
+                yield card_number, None
+            card_number += 1
+            card = {}
+        elif prop == "END" and value.strip().upper() == "VCARD":
+            if card is not None:
+                yield card_number, card
+            card = None
+        elif card is None:
+            continue
+        elif prop == "FN":
+            card["name"] = _unescape(value).strip()
+        elif prop == "N":
+            # Structured name (Family;Given;...), used when there is no FN
+            family, given = (value.split(";") + ["", ""])[:2]
+            card["n"] = " ".join(p for p in (_unescape(given), _unescape(family)) if p).strip()
+        elif prop == "EMAIL":
+            card.setdefault("email", _unescape(value).strip())
+        elif prop == "TEL":
+            card.setdefault("phone", _unescape(value).strip())
+
+    if card is not None:
+        yield card_number, None
+
+
+def _insert_chunk(session: Session, user_id: int, chunk: list):
+    """Insert one chunk of validated contacts in a single transaction"""
+    contacts = [Contact(**row.dict(), user_id=user_id) for row in chunk]
+    for contact in contacts:
+        set_search_keys(contact)
+    session.add_all(contacts)
+    session.commit()
+
+
+def import_contacts(session: Session, user_id: int, rows: Iterator[Tuple[int, Optional[dict]]]) -> ImportResult:
+    """Validate records against ContactCreate and insert them in chunks"""
+    imported = 0
+    errors = []
+    failed = 0
+    chunk = []
+
+    def fail(row_number: int, error: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append(ImportRowError(row=row_number, error=error))
+
+    for row_number, fields in rows:
+        if fields is None:
+            fail(row_number, "Record is malformed")
+            continue
+        name = fields.get("name") or fields.get("n")
+        if not name:
+            fail(row_number, "Record has no name")
+            continue
+        try:
+            # Phonebook entries often lack an email or phone; store those as empty
+            contact = ContactCreate(name=name, email=fields.get("email", ""), phone=fields.get("phone", ""))
+        except ValidationError as e:
+            fail(row_number, str(e))
+            continue
+
+        chunk.append(contact)
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            _insert_chunk(session, user_id, chunk)
+            imported += len(chunk)
+            chunk = []
+
+    if chunk:
+        _insert_chunk(session, user_id, chunk)
+        imported += len(chunk)
+
+    return ImportResult(imported=imported, failed=failed, errors=errors)
+
+
+def _iter_contacts(user_id: int):
+    """A user's contacts in id order, fetched in batches"""
+    # Own session: the stream outlives the request's dependency session
+    with Session(engine) as session:
+        result = session.exec(
+            select(Contact.name, Contact.email, Contact.phone)
+            .where(Contact.user_id == user_id)
+            .order_by(Contact.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        yield from result.partitions()
+
+
+def export_contacts_csv(user_id: int) -> Iterator[str]:
+    """Stream a user's contacts as CSV"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in _iter_contacts(user_id):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_contacts_vcard(user_id: int) -> Iterator[str]:
+    """Stream a user's contacts as vCard 3.0"""
+    for batch in _iter_contacts(user_id):
+        cards = []
+        for name, email, phone in batch:
+            lines = ["BEGIN:VCARD", "VERSION:3.0", f"FN:{_escape(name)}", f"N:;{_escape(name)};;;"]
+            if email:
+                lines.append(f"EMAIL:{_escape(email)}")
+            if phone:
+                lines.append(f"TEL:{_escape(phone)}")
+            lines.append("END:VCARD")
+            cards.append("\r\n".join(lines) + "\r\n")
+        yield "".join(cards)